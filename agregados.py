@@ -0,0 +1,233 @@
+import functools
+import inspect
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from analisis import version_datos, filtrar_datos, construir_arbol
+from series_tiempo import construir_motor, serie_anual, indice_estacionalidad
+from cuantiles import construir_sketches, combinar, sketch_por_cliente
+from canasta import construir_canasta
+from ingesta import ingerir_ventas
+
+# Carga de datos y agregados cacheados a nivel de proceso, sin Streamlit.
+# Los usan tanto el dashboard (reporte.py) como la API local (api.py); si ambos
+# corren en el mismo proceso comparten las mismas entradas en memoria.
+
+RUTA_VENTAS = r"C:\Users\ACER\OneDrive\Documentos\rompecabezas\dimensiones\Hechos_Ventas_Agrupado.csv"
+RUTA_CLIENTES = r"C:\Users\ACER\OneDrive\Documentos\rompecabezas\dimensiones\Dim_Cliente.csv"
+
+# Los DataFrames compartidos se entregan sin copiar a cada sesión; con
+# copy-on-write (por defecto desde pandas 3) una modificación accidental crea
+# una copia local en lugar de alterar los datos de todos
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
+# Presupuestos de memoria de las cachés (MB), configurables por variable de entorno
+MB = 1024 * 1024
+PRESUPUESTO_MB = int(os.environ.get('DASHBOARD_CACHE_MB', 512))
+
+# Resultado de la última ingesta de cada archivo de ventas (estadísticas y rechazos)
+INGESTAS = {}
+
+def cargar_datos(ruta_ventas=RUTA_VENTAS, ruta_clientes=RUTA_CLIENTES):
+    # Cargar ventas: validadas, deduplicadas y agregadas al grano mensual
+    ingesta = ingerir_ventas(ruta_ventas)
+    df = ingesta.pop('hechos')
+    INGESTAS[ruta_ventas] = ingesta
+
+    # Cargar clientes
+    df_clientes = pd.read_csv(ruta_clientes, dtype={'cod_clte': str})
+
+    return df, df_clientes, version_datos(df, df_clientes)
+
+# Tamaño aproximado en memoria de un resultado cacheado (bytes)
+def tamaño_bytes(valor):
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        uso = valor.memory_usage(deep=True)
+        return int(uso.sum()) if isinstance(valor, pd.DataFrame) else int(uso)
+    if isinstance(valor, pd.Index):
+        return int(valor.memory_usage(deep=True))
+    if isinstance(valor, np.ndarray):
+        return int(valor.nbytes)
+    if sparse.issparse(valor):
+        return sum(int(getattr(valor, nombre).nbytes) for nombre in ('data', 'indices', 'indptr', 'row', 'col') if hasattr(valor, nombre))
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(tamaño_bytes(v) for v in valor.values())
+    if isinstance(valor, (list, tuple)):
+        return sys.getsizeof(valor) + sum(tamaño_bytes(v) for v in valor)
+    return sys.getsizeof(valor)
+
+# Convierte argumentos a una clave hashable (las listas de los multiselect a tuplas)
+def _hasheable(valor):
+    if isinstance(valor, (list, tuple)):
+        return tuple(_hasheable(v) for v in valor)
+    return valor
+
+# Cachés registradas, para el panel de métricas
+CACHES = {}
+
+# Cache LRU por proceso. Igual que en st.cache_*, los parámetros que empiezan
+# con "_" (p.ej. el DataFrame) no forman parte de la clave: la versión del
+# dataset identifica los datos. Además del número de entradas se acota el
+# tamaño total (max_mb): se desalojan las menos usadas hasta entrar en el
+# presupuesto, y un resultado que por sí solo lo supera no se guarda.
+# Los fallos concurrentes de una misma clave se calculan una sola vez: el
+# primer hilo calcula y los demás esperan su resultado (o su excepción).
+def memoizar(max_entradas=32, max_mb=None):
+    def decorador(funcion):
+        firma = inspect.signature(funcion)
+        entradas = OrderedDict()
+        tamaños = {}
+        en_curso = {}
+        candado = threading.Lock()
+        max_bytes = max_mb * MB if max_mb else None
+        contadores = {'aciertos': 0, 'fallos': 0, 'esperas': 0, 'desalojos': 0, 'bytes': 0}
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            argumentos = firma.bind(*args, **kwargs)
+            argumentos.apply_defaults()
+            clave = tuple(
+                (nombre, _hasheable(valor))
+                for nombre, valor in argumentos.arguments.items()
+                if not nombre.startswith('_')
+            )
+            with candado:
+                if clave in entradas:
+                    entradas.move_to_end(clave)
+                    contadores['aciertos'] += 1
+                    return entradas[clave]
+                pendiente = en_curso.get(clave)
+                if pendiente is None:
+                    contadores['fallos'] += 1
+                    futuro = en_curso[clave] = Future()
+                else:
+                    contadores['esperas'] += 1
+            if pendiente is not None:
+                return pendiente.result()
+
+            try:
+                resultado = funcion(*args, **kwargs)
+                tamaño = tamaño_bytes(resultado)
+            except BaseException as e:
+                with candado:
+                    del en_curso[clave]
+                futuro.set_exception(e)
+                raise
+
+            with candado:
+                del en_curso[clave]
+                futuro.set_result(resultado)
+                if max_bytes is not None and tamaño > max_bytes:
+                    return resultado
+                if clave in entradas:
+                    contadores['bytes'] -= tamaños[clave]
+                entradas[clave] = resultado
+                tamaños[clave] = tamaño
+                contadores['bytes'] += tamaño
+                while len(entradas) > max_entradas or (max_bytes is not None and contadores['bytes'] > max_bytes):
+                    antigua, _ = entradas.popitem(last=False)
+                    contadores['bytes'] -= tamaños.pop(antigua)
+                    contadores['desalojos'] += 1
+            return resultado
+
+        def limpiar():
+            with candado:
+                entradas.clear()
+                tamaños.clear()
+                contadores['bytes'] = 0
+
+        def estadisticas():
+            with candado:
+                return {
+                    'cache': funcion.__name__,
+                    'entradas': len(entradas),
+                    'max_entradas': max_entradas,
+                    'mb': contadores['bytes'] / MB,
+                    'max_mb': max_mb,
+                    'aciertos': contadores['aciertos'],
+                    'fallos': contadores['fallos'],
+                    'esperas': contadores['esperas'],
+                    'desalojos': contadores['desalojos'],
+                }
+
+        envoltura.limpiar = limpiar
+        envoltura.estadisticas = estadisticas
+        CACHES[funcion.__name__] = envoltura
+        return envoltura
+    return decorador
+
+# Métricas de todas las cachés registradas
+def metricas_caches():
+    return pd.DataFrame([cache.estadisticas() for cache in CACHES.values()])
+
+# Memoria residente actual del proceso en MB (psutil si está instalado;
+# si no, /proc en Linux o el pico de getrusage como aproximación)
+def memoria_proceso_mb():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / MB
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / MB
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return float('nan')
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss viene en KB en Linux y en bytes en macOS
+    return pico / MB if sys.platform == 'darwin' else pico / 1024
+
+# Datos de ventas y clientes compartidos (solo lectura) por todas las sesiones y
+# la API: una sola copia por proceso, que se recarga si cambian los archivos
+@memoizar(max_entradas=1)
+def datos_base(ruta_ventas, ruta_clientes, modificados):
+    return cargar_datos(ruta_ventas, ruta_clientes)
+
+def datos_compartidos(ruta_ventas=RUTA_VENTAS, ruta_clientes=RUTA_CLIENTES):
+    modificados = tuple(os.stat(ruta).st_mtime_ns for ruta in (ruta_ventas, ruta_clientes))
+    return datos_base(ruta_ventas, ruta_clientes, modificados)
+
+# Árbol de drill-down: se construye una vez por estado de filtros (solo lectura)
+@memoizar(max_entradas=32, max_mb=PRESUPUESTO_MB // 4)
+def arbol_categorias(_df, version, años, categorias):
+    return construir_arbol(filtrar_datos(_df, list(años), list(categorias)))
+
+# Motor de series de tiempo: matriz densa (anio, mes) x categoria, una vez por versión
+@memoizar(max_entradas=2)
+def motor_series(_df, version):
+    return construir_motor(_df)
+
+def calcular_crecimiento(df, version, año, categoria):
+    return serie_anual(motor_series(df, version), año, categoria)
+
+def calcular_estacionalidad(df, version, categoria):
+    return indice_estacionalidad(motor_series(df, version), categoria)
+
+# Sketches de cuantiles por (anio, mes, categoria), una vez por versión del dataset;
+# cada selección de filtros solo combina particiones
+@memoizar(max_entradas=2)
+def sketches_cuantiles(_df, version):
+    return construir_sketches(_df)
+
+# Tickets: combinación de particiones. Valor por cliente: totales de cada
+# cliente en la selección (no combinables entre particiones)
+def calcular_distribuciones(df, version, años, categorias):
+    tickets = combinar(sketches_cuantiles(df, version), años, categorias)
+    return tickets, sketch_por_cliente(filtrar_datos(df, list(años), list(categorias)))
+
+# Canasta de compra: matriz dispersa cesta x ítem, una vez por estado de filtros
+@memoizar(max_entradas=32, max_mb=PRESUPUESTO_MB // 4)
+def canasta_filtrada(_df, version, años, categorias, nivel, por_periodo):
+    return construir_canasta(filtrar_datos(_df, list(años), list(categorias)), nivel, por_periodo)
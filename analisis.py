@@ -0,0 +1,246 @@
+import hashlib
+
+import pandas as pd
+
+from presentacion import agrupar_pequenos
+
+# Cálculos del dashboard sin dependencias de Streamlit.
+# Cada función recibe DataFrames y devuelve los datos listos para graficar,
+# de modo que puedan ejecutarse en paralelo (hilos) y reutilizarse fuera de la app.
+
+# Mapeo de números de mes a nombres
+MESES = {
+    1: 'Enero', 2: 'Febrero', 3: 'Marzo', 4: 'Abril',
+    5: 'Mayo', 6: 'Junio', 7: 'Julio', 8: 'Agosto',
+    9: 'Septiembre', 10: 'Octubre', 11: 'Noviembre', 12: 'Diciembre'
+}
+
+# Huella del contenido de los datos: identifica la versión del dataset
+def version_datos(*dfs):
+    huella = hashlib.sha1()
+    for d in dfs:
+        huella.update(pd.util.hash_pandas_object(d, index=False).to_numpy().tobytes())
+    return huella.hexdigest()[:16]
+
+# Aplicar filtros de año y categoría
+def filtrar_datos(df, años=None, categorias=None):
+    df_filtrado = df[df['anio'].isin(años)] if años else df
+    if categorias:
+        df_filtrado = df_filtrado[df_filtrado['categoria'].isin(categorias)]
+    return df_filtrado
+
+# KPIs generales
+def calcular_kpis(df_filtrado):
+    valor_total = df_filtrado['valor_total'].sum()
+    return {
+        'valor_total': valor_total,
+        'cantidad_total': df_filtrado['cantidad_total'].sum(),
+        'ticket_promedio': valor_total / len(df_filtrado) if len(df_filtrado) > 0 else 0,
+        'clientes_unicos': df_filtrado['cod_clte'].nunique(),
+        'productos_unicos': df_filtrado['art_codi'].nunique(),
+    }
+
+# Tendencia de ventas por fecha
+def calcular_tendencia(df_filtrado):
+    return df_filtrado.groupby(['fecha']).agg({
+        'valor_total': 'sum'
+    }).reset_index()
+
+# Pivot año x mes para el mapa de calor (None si no hay datos)
+def calcular_mapa_calor(df_filtrado):
+    heatmap_data = df_filtrado.groupby(['anio', 'mes']).agg({
+        'valor_total': 'sum'
+    }).reset_index()
+
+    if heatmap_data.empty:
+        return None
+    return heatmap_data.pivot(index='anio', columns='mes', values='valor_total')
+
+# Variación porcentual entre dos valores (0 si la base es 0)
+def _variacion(actual, base):
+    return ((actual / base) - 1) * 100 if base > 0 else 0
+
+# Comparación de KPIs y categorías entre dos períodos (año, mes)
+def calcular_comparacion(df, periodo1, periodo2):
+    (periodo1_año, periodo1_mes), (periodo2_año, periodo2_mes) = periodo1, periodo2
+    df_periodo1 = df[(df['anio'] == periodo1_año) & (df['mes'] == periodo1_mes)]
+    df_periodo2 = df[(df['anio'] == periodo2_año) & (df['mes'] == periodo2_mes)]
+
+    kpis = []
+    categorias = []
+    for df_periodo, año, mes in ((df_periodo1, periodo1_año, periodo1_mes),
+                                 (df_periodo2, periodo2_año, periodo2_mes)):
+        kpis.append({
+            'valor_total': df_periodo['valor_total'].sum(),
+            'cantidad_total': df_periodo['cantidad_total'].sum(),
+            'clientes_unicos': df_periodo['cod_clte'].nunique()
+        })
+        cat_periodo = df_periodo.groupby('categoria')['valor_total'].sum().reset_index()
+        # Agrupar categorías pequeñas (el período se asigna después para que "Otros" también lo tenga)
+        cat_periodo = agrupar_pequenos(cat_periodo, 'categoria', 'valor_total')
+        cat_periodo['periodo'] = f"{MESES[mes]} {año}"
+        categorias.append(cat_periodo)
+
+    kpi_periodo1, kpi_periodo2 = kpis
+    return {
+        'kpi_periodo1': kpi_periodo1,
+        'kpi_periodo2': kpi_periodo2,
+        'diff_valor': _variacion(kpi_periodo2['valor_total'], kpi_periodo1['valor_total']),
+        'diff_cantidad': _variacion(kpi_periodo2['cantidad_total'], kpi_periodo1['cantidad_total']),
+        'diff_clientes': _variacion(kpi_periodo2['clientes_unicos'], kpi_periodo1['clientes_unicos']),
+        'cat_comparacion': pd.concat(categorias),
+    }
+
+# Top N clientes por valor, con nombre y participación
+def calcular_top_clientes(df_filtrado, df_clientes, n=5):
+    top_clientes = (
+        df_filtrado.groupby('cod_clte')
+        .agg({'valor_total': 'sum'})
+        .reset_index()
+    )
+    top_clientes['cod_clte'] = top_clientes['cod_clte'].astype(str)
+    top_clientes = top_clientes.merge(df_clientes[['cod_clte', 'nom_clte']], on='cod_clte', how='left')
+
+    top_clientes = top_clientes.sort_values('valor_total', ascending=False).head(n)
+    top_clientes['cliente'] = top_clientes['nom_clte'] + ' (' + top_clientes['cod_clte'] + ')'
+
+    total_ventas = df_filtrado['valor_total'].sum()
+    if not top_clientes.empty and total_ventas > 0:
+        top_clientes['porcentaje'] = top_clientes['valor_total'] / total_ventas * 100
+    return top_clientes, total_ventas
+
+# Distribución de clientes por número de meses con compras
+def calcular_frecuencia(df_filtrado):
+    frecuencia_distribucion = df_filtrado.groupby('cod_clte')['mes'].nunique().value_counts().sort_index().reset_index()
+    frecuencia_distribucion.columns = ['meses_activos', 'n_clientes']
+    return frecuencia_distribucion
+
+# Segmentación de clientes por valor y frecuencia (RFM simplificado)
+def calcular_segmentacion(df_filtrado, df_clientes):
+    df_segmentacion = df_filtrado.groupby('cod_clte').agg({
+        'valor_total': 'sum',
+        'mes': 'nunique',
+    }).reset_index()
+    df_segmentacion['cod_clte'] = df_segmentacion['cod_clte'].astype(str)
+    df_segmentacion = df_segmentacion.merge(df_clientes[['cod_clte', 'nom_clte']], on='cod_clte', how='left')
+
+    if df_segmentacion.empty:
+        return df_segmentacion
+
+    df_segmentacion['valor_norm'] = df_segmentacion['valor_total'] / df_segmentacion['valor_total'].max()
+    df_segmentacion['freq_norm'] = df_segmentacion['mes'] / df_segmentacion['mes'].max()
+
+    df_segmentacion['segmento'] = 'Pequeños'
+    df_segmentacion.loc[(df_segmentacion['valor_norm'] >= 0.5) & (df_segmentacion['freq_norm'] >= 0.5), 'segmento'] = 'VIP'
+    df_segmentacion.loc[(df_segmentacion['valor_norm'] >= 0.5) & (df_segmentacion['freq_norm'] < 0.5), 'segmento'] = 'Grandes Ocasionales'
+    df_segmentacion.loc[(df_segmentacion['valor_norm'] < 0.5) & (df_segmentacion['freq_norm'] >= 0.5), 'segmento'] = 'Frecuentes Pequeños'
+    return df_segmentacion
+
+# Porcentaje de clientes que compran cada categoría
+def calcular_penetracion(df_filtrado):
+    total_clientes = df_filtrado['cod_clte'].nunique()
+    penetracion_categorias = df_filtrado.groupby('categoria')['cod_clte'].nunique().reset_index()
+    penetracion_categorias.columns = ['categoria', 'clientes']
+    penetracion_categorias['penetracion'] = penetracion_categorias['clientes'] / total_clientes * 100
+
+    # Agrupar categorías pequeñas
+    return agrupar_pequenos(penetracion_categorias, 'categoria', 'penetracion')
+
+# Top N productos según una métrica ('cantidad_total' o 'valor_total')
+def calcular_top_productos(df_filtrado, columna, n=10):
+    top_productos = df_filtrado.groupby(['art_codi', 'art_desc']).agg({
+        columna: 'sum'
+    }).sort_values(columna, ascending=False).head(n).reset_index()
+
+    if len(top_productos) > 0:
+        total = top_productos[columna].sum()
+        top_productos['porcentaje'] = top_productos[columna] / total * 100
+    return top_productos
+
+# Niveles del árbol de drill-down y columna descriptiva de cada nivel
+NIVELES_ARBOL = ('categoria', 'subcategoria', 'art_codi')
+ETIQUETAS_NIVEL = {'art_codi': 'art_desc'}
+
+# Normaliza la clave de un grupo a tupla (ruta desde la raíz)
+def _ruta(clave):
+    return clave if isinstance(clave, tuple) else (clave,)
+
+# Agregado de valor, cantidad y clientes distintos para un prefijo de niveles
+def _agregar_nivel(df, claves, etiqueta=None):
+    agregaciones = {
+        'valor_total': ('valor_total', 'sum'),
+        'cantidad_total': ('cantidad_total', 'sum'),
+        'clientes': ('cod_clte', 'nunique'),
+    }
+    if etiqueta:
+        agregaciones[etiqueta] = (etiqueta, 'first')
+    return (
+        df.groupby(list(claves), sort=False)
+        .agg(**agregaciones)
+        .sort_values('valor_total', ascending=False)
+    )
+
+def _nuevo_nodo(nivel, clave, valor_total, cantidad_total, clientes):
+    return {
+        'nivel': nivel,
+        'clave': clave,
+        'valor_total': valor_total,
+        'cantidad_total': cantidad_total,
+        'clientes': clientes,
+        'hijos': None,       # agregados de los hijos, ordenados por valor
+        'subarbol': {},      # clave del hijo -> nodo (solo niveles no hoja)
+        'top_hojas': None,   # mejores hojas (productos) bajo este nodo
+    }
+
+# Árbol jerárquico categoria -> subcategoria -> producto.
+# Se construye una vez por estado de filtros con un groupby por nivel; después
+# cada paso del drill-down es una búsqueda en diccionario, sin volver a filtrar df.
+def construir_arbol(df_filtrado, niveles=NIVELES_ARBOL, top_hojas=10):
+    niveles = tuple(niveles)
+    agregados = [
+        _agregar_nivel(df_filtrado, niveles[:i + 1], ETIQUETAS_NIVEL.get(nivel))
+        for i, nivel in enumerate(niveles)
+    ]
+    hojas = agregados[-1]
+    niveles_padre_hoja = list(range(len(niveles) - 1))
+
+    raiz = _nuevo_nodo(
+        None, None,
+        df_filtrado['valor_total'].sum(),
+        df_filtrado['cantidad_total'].sum(),
+        df_filtrado['cod_clte'].nunique(),
+    )
+    raiz['niveles'] = niveles
+    raiz['agregados'] = agregados
+    raiz['hijos'] = agregados[0]
+    raiz['top_hojas'] = hojas.head(top_hojas).droplevel(niveles_padre_hoja)
+
+    nodos = {(): raiz}
+    for profundidad in range(1, len(niveles)):
+        prefijo = list(range(profundidad))
+
+        # Nodos del nivel anterior
+        for fila in agregados[profundidad - 1].itertuples():
+            ruta = _ruta(fila.Index)
+            nodo = _nuevo_nodo(niveles[profundidad - 1], ruta[-1],
+                               fila.valor_total, fila.cantidad_total, fila.clientes)
+            nodos[ruta[:-1]]['subarbol'][ruta[-1]] = nodo
+            nodos[ruta] = nodo
+
+        # Hijos de cada nodo: un solo reparto del agregado del nivel
+        for ruta, grupo in agregados[profundidad].groupby(level=prefijo, sort=False):
+            nodos[_ruta(ruta)]['hijos'] = grupo.droplevel(prefijo)
+
+        # Mejores hojas de cada nodo (hojas ya viene ordenado por valor)
+        top = hojas.groupby(level=prefijo, sort=False).head(top_hojas)
+        for ruta, grupo in top.groupby(level=prefijo, sort=False):
+            nodos[_ruta(ruta)]['top_hojas'] = grupo.droplevel(niveles_padre_hoja)
+
+    return raiz
+
+# Nodo del árbol para una ruta, p.ej. ('Bebidas', 'Gaseosas'); KeyError si no existe
+def nodo_arbol(arbol, ruta=()):
+    nodo = arbol
+    for clave in ruta:
+        nodo = nodo['subarbol'][clave]
+    return nodo
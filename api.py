@@ -0,0 +1,388 @@
+import argparse
+import gzip
+import hashlib
+import json
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from analisis import (
+    version_datos,
+    filtrar_datos,
+    calcular_kpis,
+    calcular_tendencia,
+    calcular_mapa_calor,
+    calcular_comparacion,
+    calcular_top_clientes,
+    calcular_frecuencia,
+    calcular_segmentacion,
+    calcular_penetracion,
+    calcular_top_productos,
+    nodo_arbol,
+)
+from series_tiempo import TOTAL
+from canasta import NIVELES_CANASTA
+from cuantiles import cuantiles, histograma
+from agregados import (
+    RUTA_VENTAS,
+    RUTA_CLIENTES,
+    PRESUPUESTO_MB,
+    cargar_datos,
+    memoizar,
+    metricas_caches,
+    memoria_proceso_mb,
+    arbol_categorias,
+    calcular_crecimiento,
+    calcular_estacionalidad,
+    calcular_distribuciones,
+    canasta_filtrada,
+)
+
+# API HTTP local (JSON) con los mismos números del dashboard.
+#
+#   GET /                          lista de análisis disponibles
+#   GET /version                   versión del dataset
+#   GET /metricas                  cachés (entradas, MB, desalojos) y memoria del proceso
+#   GET /<analisis>?anio=2024&anio=2023&categoria=Bebidas&...
+#
+# Las respuestas llevan un ETag débil (W/"...") derivado de la versión del
+# dataset y de la consulta: es el mismo con y sin gzip, porque los cuerpos son
+# equivalentes pero no idénticos byte a byte. Con If-None-Match se responde 304
+# sin recalcular nada. Las tablas
+# se envían en formato columnar ({"filas": n, "columnas": {col: [...]}}) o como
+# Arrow IPC con ?formato=arrow (requiere pyarrow), y se comprimen con gzip si el
+# cliente lo acepta.
+
+TIPO_JSON = 'application/json; charset=utf-8'
+TIPO_ARROW = 'application/vnd.apache.arrow.stream'
+# Respuestas más pequeñas que esto no se comprimen
+MINIMO_GZIP = 1024
+
+# Parámetros de consulta
+def _enteros(params, nombre):
+    return [int(v) for v in params.get(nombre, [])]
+
+def _texto(params, nombre, defecto=None):
+    valores = params.get(nombre)
+    return valores[-1] if valores else defecto
+
+def _entero(params, nombre, defecto, minimo=1):
+    valor = int(_texto(params, nombre, defecto))
+    if valor < minimo:
+        raise ValueError(f"'{nombre}' debe ser un entero mayor o igual a {minimo}")
+    return valor
+
+# Valor de un parámetro restringido a un conjunto de opciones
+def _opcion(params, nombre, opciones, defecto):
+    valor = _texto(params, nombre, defecto)
+    if valor not in opciones:
+        raise ValueError(f"'{nombre}' debe ser uno de: {', '.join(opciones)}")
+    return valor
+
+def _periodo(params, nombre):
+    texto = _texto(params, nombre)
+    if texto is None:
+        raise ValueError(f"Falta el parámetro '{nombre}' (formato AAAA-MM)")
+    año, mes = texto.split('-')
+    if not 1 <= int(mes) <= 12:
+        raise ValueError(f"Mes fuera de rango en '{nombre}': {texto}")
+    return int(año), int(mes)
+
+def _filtrado(datos, params):
+    return filtrar_datos(datos['df'], _enteros(params, 'anio'), params.get('categoria', []))
+
+# Análisis expuestos: nombre -> función(datos, params)
+def _kpis(datos, params):
+    return calcular_kpis(_filtrado(datos, params))
+
+def _tendencia(datos, params):
+    return calcular_tendencia(_filtrado(datos, params))
+
+def _mapa_calor(datos, params):
+    return calcular_mapa_calor(_filtrado(datos, params))
+
+def _crecimiento(datos, params):
+    años = _enteros(params, 'anio') or [int(datos['df']['anio'].max())]
+    return calcular_crecimiento(datos['df'], datos['version'], años[-1], _texto(params, 'categoria', TOTAL))
+
+def _estacionalidad(datos, params):
+    return calcular_estacionalidad(datos['df'], datos['version'], _texto(params, 'categoria', TOTAL))
+
+def _comparacion(datos, params):
+    return calcular_comparacion(datos['df'], _periodo(params, 'periodo1'), _periodo(params, 'periodo2'))
+
+def _top_clientes(datos, params):
+    top_clientes, total_ventas = calcular_top_clientes(
+        _filtrado(datos, params), datos['df_clientes'], _entero(params, 'n', 5)
+    )
+    return {'clientes': top_clientes, 'total_ventas': total_ventas}
+
+def _frecuencia(datos, params):
+    return calcular_frecuencia(_filtrado(datos, params))
+
+def _segmentacion(datos, params):
+    return calcular_segmentacion(_filtrado(datos, params), datos['df_clientes'])
+
+def _penetracion(datos, params):
+    return calcular_penetracion(_filtrado(datos, params))
+
+def _top_productos(datos, params):
+    metrica = _opcion(params, 'metrica', ('valor_total', 'cantidad_total'), 'valor_total')
+    return calcular_top_productos(_filtrado(datos, params), metrica, _entero(params, 'n', 10))
+
+def _drilldown(datos, params):
+    arbol = arbol_categorias(
+        datos['df'], datos['version'],
+        tuple(_enteros(params, 'anio')), tuple(params.get('categoria', []))
+    )
+    ruta = params.get('ruta', [])
+    # El último nivel (productos) no tiene hijos
+    if len(ruta) >= len(arbol['niveles']):
+        raise ValueError(f"'ruta' admite como máximo {len(arbol['niveles']) - 1} niveles")
+    nodo = nodo_arbol(arbol, ruta)
+    return {
+        'niveles': arbol['niveles'],
+        'ruta': ruta,
+        'valor_total': nodo['valor_total'],
+        'cantidad_total': nodo['cantidad_total'],
+        'clientes': nodo['clientes'],
+        'hijos': nodo['hijos'],
+        'top_hojas': nodo['top_hojas'],
+    }
+
+def _canasta(datos, params):
+    canasta = canasta_filtrada(
+        datos['df'], datos['version'],
+        tuple(_enteros(params, 'anio')), tuple(params.get('categoria', [])),
+        _opcion(params, 'nivel', NIVELES_CANASTA, 'categoria'), _texto(params, 'mismo_mes', '1') != '0'
+    )
+    return {
+        'n_cestas': canasta['n_cestas'],
+        'reglas': canasta['reglas'].head(_entero(params, 'n', 100)),
+    }
+
+def _distribuciones(datos, params):
+    tickets, clientes = calcular_distribuciones(
+        datos['df'], datos['version'], _enteros(params, 'anio'), params.get('categoria', [])
+    )
+    qs = (0.5, 0.9, 0.99)
+    return {
+        nombre: {
+            'n': sketch['n'],
+            'promedio': sketch['suma'] / sketch['n'] if sketch['n'] else None,
+            'cuantiles': dict(zip(('p50', 'p90', 'p99'), cuantiles(sketch, qs))),
+            'histograma': histograma(sketch),
+        }
+        for nombre, sketch in (('ticket', tickets), ('valor_cliente', clientes))
+    }
+
+ANALISIS = {
+    'kpis': _kpis,
+    'tendencia': _tendencia,
+    'mapa_calor': _mapa_calor,
+    'crecimiento': _crecimiento,
+    'estacionalidad': _estacionalidad,
+    'comparacion': _comparacion,
+    'top_clientes': _top_clientes,
+    'frecuencia': _frecuencia,
+    'segmentacion': _segmentacion,
+    'penetracion': _penetracion,
+    'top_productos': _top_productos,
+    'drilldown': _drilldown,
+    'canasta': _canasta,
+    'distribuciones': _distribuciones,
+}
+
+# Serialización columnar: cada columna se convierte de una vez con tolist()
+def _lista(arreglo):
+    arreglo = np.asarray(arreglo)
+    if arreglo.dtype.kind == 'M':
+        textos = np.datetime_as_string(arreglo, unit='D').astype(object)
+        textos[np.isnat(arreglo)] = None
+        return textos.tolist()
+    if arreglo.dtype.kind == 'f':
+        finitos = np.isfinite(arreglo)
+        if finitos.all():
+            return arreglo.tolist()
+        objetos = arreglo.astype(object)
+        objetos[~finitos] = None
+        return objetos.tolist()
+    if arreglo.dtype.kind == 'O':
+        objetos = arreglo.copy()
+        objetos[pd.isna(arreglo)] = None
+        return objetos.tolist()
+    return arreglo.tolist()
+
+# Los índices con nombre (p.ej. 'categoria' en el drill-down) pasan a ser columnas
+def _con_indice(df):
+    if any(nombre is not None for nombre in df.index.names):
+        return df.reset_index()
+    return df.reset_index(drop=True)
+
+def _columnar(df):
+    df = _con_indice(df)
+    return {
+        'filas': len(df),
+        'columnas': {str(columna): _lista(df[columna].to_numpy()) for columna in df.columns},
+    }
+
+def _serializable(valor):
+    if isinstance(valor, pd.DataFrame):
+        return _columnar(valor)
+    if isinstance(valor, (pd.Series, pd.Index, np.ndarray)):
+        return _lista(np.asarray(valor))
+    if isinstance(valor, dict):
+        return {str(clave): _serializable(v) for clave, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_serializable(v) for v in valor]
+    if isinstance(valor, np.generic):
+        valor = valor.item()
+    if isinstance(valor, float) and not math.isfinite(valor):
+        return None
+    return valor
+
+# Valores sueltos dentro de columnas de objetos (escalares NumPy, fechas)
+def _por_defecto(valor):
+    if isinstance(valor, (pd.Timestamp, np.datetime64)):
+        return str(valor)
+    if isinstance(valor, np.generic):
+        return valor.item()
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+def _a_arrow(resultado):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ValueError("El formato arrow requiere pyarrow instalado")
+    if not isinstance(resultado, pd.DataFrame):
+        raise ValueError("El formato arrow solo está disponible para análisis que devuelven una tabla")
+    tabla = pa.Table.from_pandas(_con_indice(resultado), preserve_index=False)
+    salida = pa.BufferOutputStream()
+    with pa.ipc.new_stream(salida, tabla.schema) as escritor:
+        escritor.write_table(tabla)
+    return salida.getvalue().to_pybytes()
+
+# Clave normalizada de una consulta (orden de parámetros irrelevante)
+def _consulta(params):
+    return tuple(sorted((nombre, tuple(valores)) for nombre, valores in params.items()))
+
+def etag(version, nombre, consulta):
+    huella = hashlib.sha1(repr((version, nombre, consulta)).encode()).hexdigest()[:20]
+    return f'W/"{huella}"'
+
+# Respuesta serializada, cacheada por versión del dataset y consulta
+@memoizar(max_entradas=256, max_mb=PRESUPUESTO_MB // 8)
+def respuesta(_datos, version, nombre, consulta):
+    params = {clave: list(valores) for clave, valores in consulta}
+    resultado = ANALISIS[nombre](_datos, params)
+    if _texto(params, 'formato', 'json') == 'arrow':
+        return _a_arrow(resultado), TIPO_ARROW
+    cuerpo = json.dumps(_serializable(resultado), separators=(',', ':'), allow_nan=False, default=_por_defecto)
+    return cuerpo.encode('utf-8'), TIPO_JSON
+
+class ManejadorAPI(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _enviar(self, estado, cuerpo=b'', tipo=TIPO_JSON, cabeceras=None):
+        if len(cuerpo) >= MINIMO_GZIP and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            cuerpo = gzip.compress(cuerpo, compresslevel=5)
+            cabeceras = dict(cabeceras or {}, **{'Content-Encoding': 'gzip'})
+        self.send_response(estado)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.send_header('Vary', 'Accept-Encoding')
+        for nombre, valor in (cabeceras or {}).items():
+            self.send_header(nombre, valor)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(cuerpo)
+
+    def _enviar_json(self, estado, valor, cabeceras=None):
+        self._enviar(estado, json.dumps(valor).encode('utf-8'), TIPO_JSON, cabeceras)
+
+    def do_GET(self):
+        partes = urlsplit(self.path)
+        nombre = partes.path.strip('/')
+        datos = self.server.datos
+
+        if nombre == '':
+            return self._enviar_json(200, {'analisis': sorted(ANALISIS)})
+        if nombre == 'version':
+            return self._enviar_json(200, {'version': datos['version']})
+        if nombre == 'metricas':
+            return self._enviar_json(200, {
+                'memoria_proceso_mb': memoria_proceso_mb(),
+                'caches': _serializable(metricas_caches()),
+            })
+        if nombre not in ANALISIS:
+            return self._enviar_json(404, {'error': f"Análisis desconocido: '{nombre}'"})
+
+        consulta = _consulta(parse_qs(partes.query))
+        etiqueta = etag(datos['version'], nombre, consulta)
+        cabeceras = {'ETag': etiqueta, 'Cache-Control': 'no-cache'}
+
+        # Petición condicional: la versión no cambió, no hace falta recalcular
+        coincidencias = [e.strip() for e in self.headers.get('If-None-Match', '').split(',')]
+        if etiqueta in coincidencias or '*' in coincidencias:
+            return self._enviar(304, cabeceras=cabeceras)
+
+        try:
+            cuerpo, tipo = respuesta(datos, datos['version'], nombre, consulta)
+        except (ValueError, KeyError, TypeError) as e:
+            return self._enviar_json(400, {'error': str(e)})
+        self._enviar(200, cuerpo, tipo, cabeceras)
+
+    do_HEAD = do_GET
+
+    def log_message(self, formato, *args):
+        if self.server.registrar:
+            super().log_message(formato, *args)
+
+class ServidorAPI(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, direccion, df, df_clientes, version=None, registrar=True):
+        super().__init__(direccion, ManejadorAPI)
+        self.registrar = registrar
+        self.actualizar_datos(df, df_clientes, version)
+
+    # Cambia los datos servidos (p.ej. tras recargar los CSV) sin reiniciar el
+    # servidor; cada petición toma el diccionario completo de una vez
+    def actualizar_datos(self, df, df_clientes, version=None):
+        self.datos = {
+            'df': df,
+            'df_clientes': df_clientes,
+            'version': version or version_datos(df, df_clientes),
+        }
+
+# Inicia la API en un hilo de fondo del proceso actual (p.ej. junto al dashboard,
+# compartiendo los agregados cacheados en agregados.py)
+def iniciar_en_segundo_plano(df, df_clientes, version=None, host='127.0.0.1', puerto=8765, registrar=False):
+    servidor = ServidorAPI((host, puerto), df, df_clientes, version, registrar)
+    threading.Thread(target=servidor.serve_forever, name='api-dashboard', daemon=True).start()
+    return servidor
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API HTTP local con los agregados del dashboard de ventas")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8765)
+    parser.add_argument('--ventas', default=RUTA_VENTAS, help="CSV de hechos de ventas")
+    parser.add_argument('--clientes', default=RUTA_CLIENTES, help="CSV de la dimensión de clientes")
+    args = parser.parse_args(argv)
+
+    df, df_clientes, version = cargar_datos(args.ventas, args.clientes)
+    servidor = ServidorAPI((args.host, args.puerto), df, df_clientes, version)
+    print(f"API del dashboard en http://{args.host}:{servidor.server_port} (datos {version})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+if __name__ == '__main__':
+    main()
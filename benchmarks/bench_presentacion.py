@@ -0,0 +1,107 @@
+"""Micro-benchmarks de la capa de presentación.
+
+Compara la implementación original (copias de DataFrames y apply fila a fila)
+con las versiones vectorizadas de presentacion.py sobre conjuntos de
+categorías y clientes de distintos tamaños.
+
+Uso:
+    python benchmarks/bench_presentacion.py [--repeticiones 5]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from presentacion import (  # noqa: E402
+    agrupar_pequenos,
+    formatear_valor,
+    formatear_valores,
+    formatear_moneda,
+    formatear_porcentajes,
+    colores_signo,
+)
+
+TAMAÑOS = (20, 2_000, 200_000)
+
+
+# Implementación anterior de agrupar_pequenos, como referencia
+def agrupar_pequenos_original(df, columna_categoria, columna_valor, umbral_porcentaje=4):
+    total = df[columna_valor].sum()
+    df_con_porcentaje = df.copy()
+    df_con_porcentaje['porcentaje'] = df_con_porcentaje[columna_valor] / total * 100
+    grandes = df_con_porcentaje[df_con_porcentaje['porcentaje'] >= umbral_porcentaje]
+    pequenos = df_con_porcentaje[df_con_porcentaje['porcentaje'] < umbral_porcentaje]
+    if not pequenos.empty:
+        otros = pd.DataFrame({
+            columna_categoria: ['Otros'],
+            columna_valor: [pequenos[columna_valor].sum()],
+            'porcentaje': [pequenos['porcentaje'].sum()]
+        })
+        resultado = pd.concat([grandes, otros], ignore_index=True)
+    else:
+        resultado = grandes
+    return resultado.sort_values(columna_valor, ascending=False)
+
+
+def datos_sinteticos(n, semilla=42):
+    rng = np.random.default_rng(semilla)
+    # Distribución de cola larga: pocas categorías grandes y muchas pequeñas
+    return pd.DataFrame({
+        'categoria': [f'cat_{i}' for i in range(n)],
+        'valor_total': rng.pareto(1.2, n) * 1e5,
+        'clientes': rng.integers(1, 10_000, n),
+    })
+
+
+def medir(funcion, repeticiones):
+    numero = 1
+    # Ajustar el número de llamadas para que cada medición dure al menos ~50 ms
+    while timeit.timeit(funcion, number=numero) < 0.05 and numero < 10_000:
+        numero *= 10
+    return min(timeit.repeat(funcion, number=numero, repeat=repeticiones)) / numero
+
+
+def casos(df):
+    valores = df['valor_total']
+    crecimiento = valores.pct_change() * 100
+    return [
+        ('agrupar_pequenos',
+         lambda: agrupar_pequenos_original(df, 'categoria', 'valor_total'),
+         lambda: agrupar_pequenos(df, 'categoria', 'valor_total')),
+        ('formatear_valor',
+         lambda: valores.apply(formatear_valor),
+         lambda: formatear_valores(valores)),
+        ('moneda $x,xxx.xx',
+         lambda: valores.apply(lambda x: f"${x:,.2f}"),
+         lambda: formatear_moneda(valores)),
+        ('porcentaje x.x%',
+         lambda: valores.apply(lambda x: f"{x:.1f}%"),
+         lambda: formatear_porcentajes(valores)),
+        ('color por signo',
+         lambda: crecimiento.apply(lambda x: 'green' if x > 0 else 'red'),
+         lambda: colores_signo(crecimiento)),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"{'caso':<20}{'filas':>10}{'original (ms)':>16}{'vectorizado (ms)':>19}{'mejora':>9}")
+    for n in TAMAÑOS:
+        df = datos_sinteticos(n)
+        for nombre, original, vectorizado in casos(df):
+            t_original = medir(original, args.repeticiones)
+            t_vectorizado = medir(vectorizado, args.repeticiones)
+            print(f"{nombre:<20}{n:>10,}{t_original * 1e3:>16.3f}{t_vectorizado * 1e3:>19.3f}"
+                  f"{t_original / t_vectorizado:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,336 @@
+"""Suite de regresión de rendimiento de las secciones del dashboard.
+
+Genera un dataset sintético reproducible (semilla fija), ejecuta cada análisis
+del dashboard y compara tiempo, pico de memoria y un resumen numérico del
+resultado contra una línea base guardada. Una sección regresa si supera su
+presupuesto de tiempo o de memoria, o si su resultado cambia.
+
+Los presupuestos son la línea base multiplicada por una tolerancia (más una
+holgura fija para las secciones muy rápidas), o valores absolutos por sección
+desde un archivo JSON: {"seccion": {"ms": 50, "mb": 20}}.
+
+Además comprueba que la deduplicación de la ingesta escala con el tamaño del
+bloque y no con las filas ya vistas (el último bloque no debe tardar más de
+MAX_ESCALADO_DEDUPLICACION veces lo que tarda el primero).
+
+Uso:
+    python benchmarks/regresion.py                       # comparar y escribir el reporte
+    python benchmarks/regresion.py --guardar-linea-base  # actualizar la línea base
+    python benchmarks/regresion.py --seccion segmentacion --seccion drilldown
+
+Sale con código 1 si alguna sección regresa.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(DIRECTORIO))
+
+from analisis import (  # noqa: E402
+    filtrar_datos,
+    calcular_kpis,
+    calcular_tendencia,
+    calcular_mapa_calor,
+    calcular_comparacion,
+    calcular_top_clientes,
+    calcular_frecuencia,
+    calcular_segmentacion,
+    calcular_penetracion,
+    calcular_top_productos,
+    construir_arbol,
+)
+from series_tiempo import construir_motor, serie_anual, indice_estacionalidad  # noqa: E402
+from cuantiles import construir_sketches, combinar, sketch_por_cliente  # noqa: E402
+from canasta import construir_canasta  # noqa: E402
+from presentacion import agrupar_pequenos  # noqa: E402
+from ingesta import Deduplicador  # noqa: E402
+
+LINEA_BASE = os.path.join(DIRECTORIO, 'linea_base.json')
+REPORTE = os.path.join(DIRECTORIO, 'reporte_regresion.json')
+
+# Secciones por debajo de esta holgura no se marcan lentas por ruido de medición
+HOLGURA_MS = 5.0
+HOLGURA_MB = 1.0
+# Tolerancia relativa al comparar los resúmenes de resultados
+TOLERANCIA_RESULTADO = 1e-6
+# Cuánto más puede tardar un bloque de la deduplicación al final de un archivo
+# grande que al principio (constante si cada bloque cuesta O(bloque))
+MAX_ESCALADO_DEDUPLICACION = 3.0
+
+
+# Dataset con la forma de Hechos_Ventas_Agrupado: años, meses, clientes y una
+# jerarquía categoría -> subcategoría -> producto con ventas de cola larga
+def datos_sinteticos(filas=200_000, clientes=20_000, semilla=42):
+    rng = np.random.default_rng(semilla)
+    categoria = rng.integers(0, 12, filas)
+    subcategoria = categoria * 10 + rng.integers(0, 8, filas)
+    producto = subcategoria * 100 + rng.integers(0, 50, filas)
+    df = pd.DataFrame({
+        'anio': rng.integers(2021, 2025, filas),
+        'mes': rng.integers(1, 13, filas),
+        'cod_clte': rng.zipf(1.3, filas).clip(max=clientes).astype(str),
+        'categoria': pd.Index([f'Categoria {c}' for c in range(12)]).take(categoria),
+        'subcategoria': pd.Index([f'Subcategoria {s}' for s in range(120)]).take(subcategoria),
+        'art_codi': producto,
+        'art_desc': pd.Index([f'Producto {p}' for p in range(12_000)]).take(producto),
+        'valor_total': (rng.pareto(1.5, filas) + 1) * 100,
+        'cantidad_total': rng.integers(1, 50, filas),
+    })
+    df['fecha'] = pd.to_datetime(pd.DataFrame({'year': df['anio'], 'month': df['mes'], 'day': 1}))
+    df_clientes = pd.DataFrame({
+        'cod_clte': [str(i) for i in range(1, clientes + 1)],
+        'nom_clte': [f'Cliente {i}' for i in range(1, clientes + 1)],
+    })
+    return df, df_clientes
+
+
+# Entradas compartidas por las secciones, con los filtros por defecto del
+# dashboard (último año, todas las categorías)
+def contexto(df, df_clientes):
+    ultimo = int(df['anio'].max())
+    df_filtrado = filtrar_datos(df, [ultimo])
+    return {
+        'df': df,
+        'df_clientes': df_clientes,
+        'df_filtrado': df_filtrado,
+        'año': ultimo,
+        'periodo1': (ultimo - 1, 1),
+        'periodo2': (ultimo, 1),
+        'por_producto': df_filtrado.groupby('art_desc', as_index=False)['valor_total'].sum(),
+    }
+
+
+# Secciones: nombre -> cálculo sobre el contexto. Las que en el dashboard usan
+# un agregado cacheado (motor, sketches, árbol, canasta) miden su construcción.
+SECCIONES = {
+    'kpis': lambda c: calcular_kpis(c['df_filtrado']),
+    'agrupar_pequenos': lambda c: agrupar_pequenos(c['por_producto'], 'art_desc', 'valor_total'),
+    'crecimiento': lambda c: serie_anual(construir_motor(c['df']), c['año']),
+    'tendencia': lambda c: calcular_tendencia(c['df_filtrado']),
+    'mapa_calor': lambda c: calcular_mapa_calor(c['df_filtrado']),
+    'estacionalidad': lambda c: indice_estacionalidad(construir_motor(c['df'])),
+    'comparacion': lambda c: calcular_comparacion(c['df'], c['periodo1'], c['periodo2']),
+    'top_clientes': lambda c: calcular_top_clientes(c['df_filtrado'], c['df_clientes']),
+    'frecuencia': lambda c: calcular_frecuencia(c['df_filtrado']),
+    'distribuciones': lambda c: combinar(construir_sketches(c['df']), [c['año']]),
+    'distribuciones_clientes': lambda c: sketch_por_cliente(c['df_filtrado']),
+    'segmentacion': lambda c: calcular_segmentacion(c['df_filtrado'], c['df_clientes']),
+    'penetracion': lambda c: calcular_penetracion(c['df_filtrado']),
+    'canasta': lambda c: construir_canasta(c['df_filtrado'], 'subcategoria'),
+    'top_productos': lambda c: calcular_top_productos(c['df_filtrado'], 'valor_total'),
+    'drilldown': lambda c: construir_arbol(c['df_filtrado']),
+}
+
+
+# Resumen numérico de un resultado: cantidad de valores y suma de los numéricos.
+# Detecta cambios de resultado sin depender del orden de filas ni del formato.
+def resumir(valor):
+    if isinstance(valor, pd.DataFrame):
+        numericas = valor.select_dtypes('number')
+        return {'valores': int(valor.size), 'suma': float(np.nansum(numericas.to_numpy(dtype=float)))}
+    if isinstance(valor, (pd.Series, pd.Index, np.ndarray)):
+        arreglo = np.asarray(valor)
+        suma = np.nansum(arreglo.astype(float)) if arreglo.dtype.kind in 'biuf' else 0.0
+        return {'valores': int(arreglo.size), 'suma': float(suma)}
+    if sparse.issparse(valor):
+        return {'valores': int(valor.nnz), 'suma': float(valor.sum())}
+    if isinstance(valor, dict):
+        partes = [resumir(v) for v in valor.values()]
+    elif isinstance(valor, (list, tuple)):
+        partes = [resumir(v) for v in valor]
+    elif isinstance(valor, (int, float, np.number)) and not isinstance(valor, bool):
+        return {'valores': 1, 'suma': 0.0 if np.isnan(valor) else float(valor)}
+    else:
+        return {'valores': 1, 'suma': 0.0}
+    return {'valores': sum(p['valores'] for p in partes), 'suma': sum(p['suma'] for p in partes)}
+
+
+# Escalado de la deduplicación de la ingesta: mediana del tiempo por bloque en
+# los últimos bloques frente a los primeros, con todas las huellas distintas
+def escalado_deduplicacion(bloques=80, filas_por_bloque=50_000, semilla=0):
+    rng = np.random.default_rng(semilla)
+    deduplicador = Deduplicador()
+    tiempos = []
+    for _ in range(bloques):
+        claves = rng.integers(0, 2**63, filas_por_bloque).astype(np.uint64)
+        inicio = time.perf_counter()
+        deduplicador.nuevas(claves)
+        tiempos.append(time.perf_counter() - inicio)
+    muestra = max(1, bloques // 8)
+    return float(np.median(tiempos[-muestra:]) / np.median(tiempos[:muestra]))
+
+
+# Mejor tiempo de N ejecuciones, sin recolector de basura durante la medición (como timeit)
+def medir_tiempo(funcion, repeticiones):
+    tiempos = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append(time.perf_counter() - inicio)
+    finally:
+        gc.enable()
+    return min(tiempos) * 1e3
+
+
+# Pico de memoria asignada durante una ejecución (NumPy y pandas se registran en tracemalloc)
+def medir_memoria(funcion):
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        funcion()
+        return (tracemalloc.get_traced_memory()[1] - base) / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+
+def presupuesto(base, tolerancia, holgura, absoluto=None):
+    if absoluto is not None:
+        return absoluto
+    if base is None:
+        return None
+    return max(base * tolerancia, base + holgura)
+
+
+def evaluar(nombre, medicion, linea_base, args, absolutos):
+    base = linea_base.get(nombre)
+    fila = dict(seccion=nombre, **medicion)
+    fila['linea_base_ms'] = base and base['ms']
+    fila['linea_base_mb'] = base and base['mb_pico']
+    fila['presupuesto_ms'] = presupuesto(fila['linea_base_ms'], args.tolerancia_tiempo, HOLGURA_MS,
+                                         absolutos.get('ms'))
+    fila['presupuesto_mb'] = presupuesto(fila['linea_base_mb'], args.tolerancia_memoria, HOLGURA_MB,
+                                         absolutos.get('mb'))
+
+    problemas = []
+    if fila['presupuesto_ms'] is not None and medicion['ms'] > fila['presupuesto_ms']:
+        problemas.append('tiempo')
+    if fila['presupuesto_mb'] is not None and medicion['mb_pico'] > fila['presupuesto_mb']:
+        problemas.append('memoria')
+    if base is not None:
+        esperado, obtenido = base['resultado'], medicion['resultado']
+        if (esperado['valores'] != obtenido['valores']
+                or not np.isclose(esperado['suma'], obtenido['suma'], rtol=TOLERANCIA_RESULTADO)):
+            problemas.append('resultado')
+    fila['regresiones'] = problemas
+    fila['estado'] = 'sin_linea_base' if base is None else ('regresion' if problemas else 'ok')
+    return fila
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, default=200_000)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--repeticiones', type=int, default=10)
+    parser.add_argument('--seccion', action='append', choices=sorted(SECCIONES),
+                        help="Ejecutar solo estas secciones (repetible)")
+    parser.add_argument('--tolerancia-tiempo', type=float, default=2.0,
+                        help="Múltiplo de la línea base permitido en tiempo")
+    parser.add_argument('--tolerancia-memoria', type=float, default=1.25,
+                        help="Múltiplo de la línea base permitido en pico de memoria")
+    parser.add_argument('--presupuestos', help="JSON con presupuestos absolutos por sección")
+    parser.add_argument('--linea-base', default=LINEA_BASE)
+    parser.add_argument('--reporte', default=REPORTE, help="Archivo JSON del reporte")
+    parser.add_argument('--guardar-linea-base', action='store_true',
+                        help="Guardar las mediciones como nueva línea base")
+    parser.add_argument('--sin-escalado', action='store_true',
+                        help="No comprobar el escalado de la deduplicación de la ingesta")
+    args = parser.parse_args(argv)
+
+    linea_base = {}
+    if os.path.exists(args.linea_base):
+        with open(args.linea_base, encoding='utf-8') as f:
+            guardada = json.load(f)
+        # Una línea base de otro dataset no es comparable
+        if (guardada['filas'], guardada['semilla']) == (args.filas, args.semilla):
+            linea_base = guardada['secciones']
+    absolutos = {}
+    if args.presupuestos:
+        with open(args.presupuestos, encoding='utf-8') as f:
+            absolutos = json.load(f)
+
+    df, df_clientes = datos_sinteticos(args.filas, semilla=args.semilla)
+    entradas = contexto(df, df_clientes)
+
+    filas = []
+    print(f"{'sección':<26}{'ms':>10}{'base ms':>10}{'MB pico':>10}{'base MB':>10}  estado")
+    for nombre in args.seccion or SECCIONES:
+        funcion = lambda: SECCIONES[nombre](entradas)  # noqa: E731
+        resultado = funcion()  # calentamiento
+        medicion = {
+            'ms': medir_tiempo(funcion, args.repeticiones),
+            'mb_pico': medir_memoria(funcion),
+            'resultado': resumir(resultado),
+        }
+        fila = evaluar(nombre, medicion, linea_base, args, absolutos.get(nombre, {}))
+        if 'tiempo' in fila['regresiones']:
+            # Confirmar con una segunda medición antes de marcarla: descarta
+            # ráfagas de ruido de la máquina
+            medicion['ms'] = min(medicion['ms'], medir_tiempo(funcion, args.repeticiones))
+            fila = evaluar(nombre, medicion, linea_base, args, absolutos.get(nombre, {}))
+        filas.append(fila)
+        estado = fila['estado'] + (f" ({', '.join(fila['regresiones'])})" if fila['regresiones'] else '')
+        print(f"{nombre:<26}{fila['ms']:>10.2f}{fila['linea_base_ms'] or float('nan'):>10.2f}"
+              f"{fila['mb_pico']:>10.2f}{fila['linea_base_mb'] or float('nan'):>10.2f}  {estado}")
+
+    escalado = None
+    if not args.sin_escalado:
+        escalado = escalado_deduplicacion()
+        if escalado > MAX_ESCALADO_DEDUPLICACION:
+            # Igual que con el tiempo, confirmar antes de marcarlo
+            escalado = min(escalado, escalado_deduplicacion())
+        print(f"{'escalado deduplicación':<26}{escalado:>10.2f}x (máximo {MAX_ESCALADO_DEDUPLICACION:.1f}x)  "
+              f"{'regresion' if escalado > MAX_ESCALADO_DEDUPLICACION else 'ok'}")
+
+    reporte = {
+        'filas': args.filas,
+        'semilla': args.semilla,
+        'repeticiones': args.repeticiones,
+        'entorno': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'plataforma': platform.platform(),
+        },
+        'secciones': filas,
+        'escalado_deduplicacion': escalado,
+        'regresiones': [f['seccion'] for f in filas if f['estado'] == 'regresion'],
+    }
+    if escalado is not None and escalado > MAX_ESCALADO_DEDUPLICACION:
+        reporte['regresiones'].append('escalado_deduplicacion')
+    with open(args.reporte, 'w', encoding='utf-8') as f:
+        json.dump(reporte, f, indent=2, ensure_ascii=False)
+    print(f"Reporte: {args.reporte}")
+
+    if args.guardar_linea_base:
+        secciones = {**linea_base, **{
+            f['seccion']: {'ms': round(f['ms'], 3), 'mb_pico': round(f['mb_pico'], 3), 'resultado': f['resultado']}
+            for f in filas
+        }}
+        with open(args.linea_base, 'w', encoding='utf-8') as f:
+            json.dump({'filas': args.filas, 'semilla': args.semilla, 'entorno': reporte['entorno'],
+                       'secciones': secciones}, f, indent=2, ensure_ascii=False)
+        print(f"Línea base guardada en {args.linea_base}")
+        return 0
+
+    if reporte['regresiones']:
+        print(f"Secciones con regresión: {', '.join(reporte['regresiones'])}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
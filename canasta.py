@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Análisis de canasta: qué categorías/subcategorías compran los mismos clientes
+# en el mismo período. Se arma una matriz dispersa cesta x ítem (una cesta es un
+# cliente en un mes) y las co-ocurrencias salen de un solo producto X.T @ X,
+# evitando el self-join por cliente que crece de forma cuadrática.
+
+# Niveles que se ofrecen en el dashboard (a nivel de producto hay demasiados ítems
+# para que la matriz de lift sea legible)
+NIVELES_CANASTA = ('categoria', 'subcategoria')
+
+# Identificador de cesta: cliente y, si se pide, (anio, mes)
+def _codigos_cesta(df, por_periodo):
+    clientes, unicos = pd.factorize(df['cod_clte'])
+    if not por_periodo:
+        return clientes, len(unicos)
+    periodo = df['anio'].to_numpy(dtype=np.int64) * 12 + df['mes'].to_numpy(dtype=np.int64)
+    periodos, unicos_periodo = pd.factorize(periodo)
+    cestas, unicas = pd.factorize(clientes.astype(np.int64) * len(unicos_periodo) + periodos)
+    return cestas, len(unicas)
+
+def construir_canasta(df_filtrado, nivel='categoria', por_periodo=True, min_cestas=5):
+    cestas, n_cestas = _codigos_cesta(df_filtrado, por_periodo)
+    items, etiquetas = pd.factorize(df_filtrado[nivel], sort=True)
+    validos = items >= 0
+    cestas, items = cestas[validos], items[validos]
+
+    # Matriz de incidencia binaria cesta x ítem
+    incidencia = sparse.csr_matrix(
+        (np.ones(len(cestas), dtype=np.int32), (cestas, items)),
+        shape=(n_cestas, len(etiquetas))
+    )
+    incidencia.sum_duplicates()
+    incidencia.data[:] = 1
+
+    # Co-ocurrencias: cestas que contienen ambos ítems (diagonal = soporte de cada uno)
+    coocurrencias = (incidencia.T @ incidencia).tocsr()
+    conteos = np.asarray(coocurrencias.diagonal()).ravel()
+
+    # Pares i < j con suficientes cestas, en ambas direcciones (antecedente -> consecuente)
+    pares = sparse.triu(coocurrencias, k=1).tocoo()
+    suficientes = pares.data >= min_cestas
+    i, j, juntos = pares.row[suficientes], pares.col[suficientes], pares.data[suficientes].astype(float)
+    antecedente = np.concatenate([i, j])
+    consecuente = np.concatenate([j, i])
+    juntos = np.concatenate([juntos, juntos])
+
+    reglas = pd.DataFrame({
+        'antecedente': etiquetas.take(antecedente),
+        'consecuente': etiquetas.take(consecuente),
+        'cestas': juntos.astype(np.int64),
+        'soporte': juntos / n_cestas if n_cestas else np.nan,
+        'confianza': juntos / conteos[antecedente],
+        'lift': juntos * n_cestas / (conteos[antecedente] * conteos[consecuente]),
+    }).sort_values(['lift', 'cestas'], ascending=False, ignore_index=True)
+
+    return {
+        'nivel': nivel,
+        'items': pd.Index(etiquetas),
+        'conteos': conteos,
+        'n_cestas': n_cestas,
+        'coocurrencias': coocurrencias,
+        'reglas': reglas,
+    }
+
+# Matriz de lift entre los `top` ítems con más cestas
+def matriz_lift(canasta, top=15):
+    conteos = canasta['conteos']
+    seleccion = np.argsort(-conteos, kind='stable')[:top]
+    juntos = canasta['coocurrencias'][seleccion][:, seleccion].toarray().astype(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lift = juntos * canasta['n_cestas'] / np.outer(conteos[seleccion], conteos[seleccion])
+    np.fill_diagonal(lift, np.nan)
+    etiquetas = canasta['items'][seleccion]
+    return pd.DataFrame(lift, index=etiquetas, columns=etiquetas)
@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Sketches de cuantiles combinables por partición (anio, mes, categoria).
+# Cada valor se cuenta en una cubeta logarítmica (esquema DDSketch): el cuantil
+# estimado tiene error relativo <= ALPHA y combinar sketches es sumar cuentas.
+# Se guardan como una matriz dispersa partición x cubeta, de modo que cualquier
+# selección de filtros se resuelve sumando filas en lugar de ordenar valores.
+
+ALPHA = 0.01
+PARTICIONES = ('anio', 'mes', 'categoria')
+# Valores con magnitud menor a este mínimo se cuentan como cero
+VALOR_MINIMO = 1e-6
+
+def _gamma(alpha):
+    return (1 + alpha) / (1 - alpha)
+
+# Clave de cubeta con signo, monótona en el valor (0 = cero)
+def _claves(valores, alpha):
+    log_gamma = np.log(_gamma(alpha))
+    magnitud = np.abs(valores)
+    claves = np.zeros(len(valores), dtype=np.int64)
+    no_cero = magnitud >= VALOR_MINIMO
+    # +1 para que la menor magnitud representable quede en la cubeta 1
+    desplazamiento = -int(np.ceil(np.log(VALOR_MINIMO) / log_gamma)) + 1
+    claves[no_cero] = (np.ceil(np.log(magnitud[no_cero]) / log_gamma).astype(np.int64) + desplazamiento)
+    return np.sign(valores).astype(np.int64) * claves, desplazamiento
+
+# Valor representativo de cada cubeta (punto medio relativo)
+def _valores_cubeta(claves, desplazamiento, alpha):
+    gamma = _gamma(alpha)
+    magnitud = np.abs(claves) - desplazamiento
+    representativo = 2 * gamma ** magnitud.astype(float) / (gamma + 1)
+    return np.where(claves == 0, 0.0, np.sign(claves) * representativo)
+
+def construir_sketches(df, columna_valor='valor_total', particiones=PARTICIONES, alpha=ALPHA):
+    particiones = list(particiones)
+    grupos = df.groupby(particiones, sort=True, observed=True)
+    codigos = grupos.ngroup().to_numpy()
+    claves_particion = grupos.size().index.to_frame(index=False)
+    valores = df[columna_valor].to_numpy(dtype=float)
+    validos = (codigos >= 0) & ~np.isnan(valores)
+    codigos, valores = codigos[validos], valores[validos]
+
+    claves, desplazamiento = _claves(valores, alpha)
+    columnas, cubetas = pd.factorize(claves, sort=True)
+
+    conteos = sparse.csr_matrix(
+        (np.ones(len(codigos), dtype=np.int64), (codigos, columnas)),
+        shape=(len(claves_particion), len(cubetas))
+    )
+    conteos.sum_duplicates()
+
+    # Resúmenes exactos por partición (también combinables)
+    n_particiones = len(claves_particion)
+    resumen = pd.DataFrame({
+        'n': np.bincount(codigos, minlength=n_particiones),
+        'suma': np.bincount(codigos, weights=valores, minlength=n_particiones),
+    })
+    resumen['minimo'] = pd.Series(valores).groupby(codigos).min().reindex(range(n_particiones)).to_numpy()
+    resumen['maximo'] = pd.Series(valores).groupby(codigos).max().reindex(range(n_particiones)).to_numpy()
+
+    return {
+        'alpha': alpha,
+        'desplazamiento': desplazamiento,
+        'particiones': claves_particion,
+        'cubetas': np.asarray(cubetas),
+        'valores_cubeta': _valores_cubeta(np.asarray(cubetas), desplazamiento, alpha),
+        'conteos': conteos,
+        'resumen': resumen,
+    }
+
+# Sketch ya combinado (mismo formato que `combinar`) de un vector de valores
+def sketch_valores(valores, alpha=ALPHA):
+    valores = np.asarray(valores, dtype=float)
+    valores = valores[~np.isnan(valores)]
+    claves, desplazamiento = _claves(valores, alpha)
+    cubetas, conteos = np.unique(claves, return_counts=True)
+    return {
+        'alpha': alpha,
+        'valores_cubeta': _valores_cubeta(cubetas, desplazamiento, alpha),
+        'conteos': conteos,
+        'n': len(valores),
+        'suma': valores.sum(),
+        'minimo': valores.min() if len(valores) else np.nan,
+        'maximo': valores.max() if len(valores) else np.nan,
+    }
+
+# Valor por cliente: un valor por cliente con su total en los datos filtrados
+# (como en la segmentación). Los totales por cliente no se pueden combinar
+# entre particiones (un cliente activo en varios meses o categorías quedaría
+# partido en varios valores pequeños), así que se calculan por selección.
+def sketch_por_cliente(df_filtrado, columna_valor='valor_total', alpha=ALPHA):
+    totales = df_filtrado.groupby('cod_clte', sort=False, observed=True)[columna_valor].sum()
+    return sketch_valores(totales.to_numpy(), alpha)
+
+# Combina los sketches de las particiones que cumplen los filtros
+def combinar(sketches, años=None, categorias=None):
+    particiones = sketches['particiones']
+    seleccion = np.ones(len(particiones), dtype=bool)
+    if años:
+        seleccion &= particiones['anio'].isin(años).to_numpy()
+    if categorias:
+        seleccion &= particiones['categoria'].isin(categorias).to_numpy()
+
+    resumen = sketches['resumen'][seleccion]
+    return {
+        'alpha': sketches['alpha'],
+        'valores_cubeta': sketches['valores_cubeta'],
+        'conteos': np.asarray(sketches['conteos'][seleccion].sum(axis=0)).ravel(),
+        'n': int(resumen['n'].sum()),
+        'suma': resumen['suma'].sum(),
+        'minimo': resumen['minimo'].min(),
+        'maximo': resumen['maximo'].max(),
+    }
+
+# Cuantiles aproximados (q entre 0 y 1) de un sketch combinado
+def cuantiles(sketch, qs=(0.5, 0.9, 0.99)):
+    qs = np.asarray(qs, dtype=float)
+    if sketch['n'] == 0:
+        return np.full(len(qs), np.nan)
+    acumulado = np.cumsum(sketch['conteos'])
+    posiciones = np.searchsorted(acumulado, qs * (sketch['n'] - 1), side='right')
+    estimados = sketch['valores_cubeta'][np.minimum(posiciones, len(acumulado) - 1)]
+    # Los extremos exactos acotan la estimación
+    return np.clip(estimados, sketch['minimo'], sketch['maximo'])
+
+# Histograma de `bins` barras agrupando cubetas consecutivas (escala logarítmica)
+def histograma(sketch, bins=40):
+    con_datos = np.flatnonzero(sketch['conteos'])
+    if len(con_datos) == 0:
+        return pd.DataFrame(columns=['desde', 'hasta', 'conteo'])
+    primera, ultima = con_datos[0], con_datos[-1] + 1
+    grupos = np.arange(ultima - primera) * bins // (ultima - primera)
+    conteos = np.bincount(grupos, weights=sketch['conteos'][primera:ultima], minlength=bins)
+    valores = sketch['valores_cubeta'][primera:ultima]
+    bordes = np.flatnonzero(np.r_[True, np.diff(grupos) > 0])
+    return pd.DataFrame({
+        'desde': valores[bordes],
+        'hasta': np.r_[valores[bordes[1:] - 1], valores[-1]],
+        'conteo': conteos[grupos[bordes]].astype(np.int64),
+    })
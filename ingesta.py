@@ -0,0 +1,282 @@
+import argparse
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+# Tabla hash de enteros de pandas (la que usan Index.isin/duplicated), con estado
+# entre bloques; no forma parte de la API pública de pandas
+from pandas._libs.hashtable import UInt64HashTable
+
+# Ingesta de hechos de ventas: lectura por bloques, validación vectorizada de
+# esquema y tipos, deduplicación y agregación al grano mensual que usa el
+# dashboard, (anio, mes, cod_clte, art_codi). Acepta exportaciones a nivel de
+# día o de línea de documento: sin columnas anio/mes, se derivan de 'fecha'.
+#
+#   lectura -> validacion -> deduplicacion -> agregacion (parcial por bloque) -> consolidacion
+#
+# Los bloques se validan y agregan en paralelo mientras el hilo principal lee
+# el siguiente; la deduplicación se hace en orden, con las huellas de las filas
+# ya vistas, para detectar duplicados entre bloques distintos.
+
+GRANO = ['anio', 'mes', 'cod_clte', 'art_codi']
+MEDIDAS = ['valor_total', 'cantidad_total']
+# Atributos del producto: dependen solo de art_codi, se toman del primer registro
+# de cada producto en lugar de agregarlos por grupo
+ATRIBUTOS = ['categoria', 'subcategoria', 'art_desc']
+
+# Columnas obligatorias (una fila sin ellas se rechaza) y opcionales
+OBLIGATORIAS = GRANO + MEDIDAS
+OPCIONALES = ATRIBUTOS
+# Únicas columnas cuyo tipo se deja inferir al lector; el resto se lee como texto
+NUMERICAS = ['anio', 'mes'] + MEDIDAS
+AÑO_MINIMO, AÑO_MAXIMO = 1900, 2100
+
+FILAS_POR_BLOQUE = 500_000
+MAX_HILOS = min(8, os.cpu_count() or 1)
+
+# Medición de cada etapa: filas que entran y salen y segundos acumulados.
+# En las etapas paralelas los segundos suman el trabajo de todos los hilos.
+class _Estadisticas:
+    def __init__(self):
+        self.etapas = {}
+        self.candado = threading.Lock()
+
+    def registrar(self, etapa, filas_entrada, filas_salida, segundos):
+        with self.candado:
+            acumulado = self.etapas.setdefault(etapa, {'bloques': 0, 'filas_entrada': 0, 'filas_salida': 0, 'segundos': 0.0})
+            acumulado['bloques'] += 1
+            acumulado['filas_entrada'] += filas_entrada
+            acumulado['filas_salida'] += filas_salida
+            acumulado['segundos'] += segundos
+
+    def tabla(self):
+        tabla = pd.DataFrame.from_dict(self.etapas, orient='index').rename_axis('etapa').reset_index()
+        tabla['filas_por_segundo'] = tabla['filas_entrada'] / tabla['segundos'].where(tabla['segundos'] > 0)
+        return tabla
+
+# Huellas ya vistas entre bloques, en una tabla hash persistente: cada bloque
+# cuesta O(bloque) sin importar cuántas filas se hayan visto antes.
+class Deduplicador:
+    def __init__(self):
+        self.vistas = UInt64HashTable()
+
+    # Máscara de las huellas nuevas: ni repetidas dentro del bloque ni vistas antes
+    def nuevas(self, claves):
+        nuevas = ~pd.Index(claves).duplicated() & (self.vistas.lookup(claves) < 0)
+        self.vistas.map_locations(claves[nuevas])
+        return nuevas
+
+# Texto sin espacios alrededor; vacío cuenta como nulo
+def _texto(serie):
+    if not pd.api.types.is_string_dtype(serie):
+        serie = serie.astype(str).mask(serie.isna())
+    serie = serie.str.strip()
+    return serie.mask(serie == '')
+
+# Las columnas que el lector ya interpretó como numéricas no se vuelven a convertir
+def _numero(serie):
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie
+    return pd.to_numeric(serie, errors='coerce')
+
+# Huella de cada fila aceptada, para deduplicar también entre bloques. Se toma
+# sobre columnas de tipo fijo: las obligatorias ya validadas (medidas como
+# float, porque read_csv infiere el tipo de cada bloque por separado y 100 y
+# 100.0 tendrían huellas distintas) y el resto de columnas como texto. Así dos
+# líneas que solo difieren en una columna ajena al dashboard (p.ej. el número
+# de documento) no son duplicados.
+def huellas(limpio, bloque):
+    otras = [columna for columna in bloque.columns if columna not in OBLIGATORIAS]
+    filas = pd.concat([
+        limpio[GRANO],
+        limpio[MEDIDAS].astype(float),
+        bloque.loc[limpio.index, otras].astype(str),
+    ], axis=1)
+    return pd.util.hash_pandas_object(filas, index=False).to_numpy()
+
+# Valida y convierte tipos de un bloque. Devuelve el bloque
+# limpio, las filas rechazadas con el motivo (todas las reglas que fallan) y
+# las huellas de las filas aceptadas.
+def validar_bloque(bloque):
+    filas = bloque.index.to_numpy()
+    limpio = pd.DataFrame(index=bloque.index)
+    reglas = {}
+
+    if 'anio' in bloque.columns and 'mes' in bloque.columns:
+        anio, mes = _numero(bloque['anio']), _numero(bloque['mes'])
+    else:
+        fecha = pd.to_datetime(bloque['fecha'], errors='coerce')
+        reglas['fecha_invalida'] = fecha.isna().to_numpy()
+        anio, mes = fecha.dt.year, fecha.dt.month
+    reglas['anio_invalido'] = ~(anio.between(AÑO_MINIMO, AÑO_MAXIMO) & (anio % 1 == 0)).to_numpy()
+    reglas['mes_invalido'] = ~(mes.between(1, 12) & (mes % 1 == 0)).to_numpy()
+    limpio['anio'] = anio
+    limpio['mes'] = mes
+
+    for columna in ('cod_clte', 'art_codi'):
+        limpio[columna] = _texto(bloque[columna])
+        reglas[f'{columna}_vacio'] = limpio[columna].isna().to_numpy()
+
+    for columna in MEDIDAS:
+        limpio[columna] = _numero(bloque[columna])
+        reglas[f'{columna}_invalido'] = ~np.isfinite(limpio[columna].to_numpy(dtype=float))
+
+    for columna in OPCIONALES:
+        limpio[columna] = bloque[columna] if columna in bloque.columns else None
+
+    rechazo = np.logical_or.reduce(list(reglas.values()))
+    # Motivos como texto "regla1;regla2" (solo para las filas rechazadas), una
+    # concatenación vectorizada por regla
+    motivos = pd.Series('', index=bloque.index[rechazo], dtype=object)
+    for nombre, mascara in reglas.items():
+        motivos[mascara[rechazo]] += nombre + ';'
+
+    # linea: número de línea en el archivo (1 es el encabezado)
+    rechazadas = bloque[rechazo].assign(linea=filas[rechazo] + 2, motivo=motivos.str.rstrip(';'))
+    limpio = limpio[~rechazo]
+    limpio['anio'] = limpio['anio'].astype(np.int64)
+    limpio['mes'] = limpio['mes'].astype(np.int64)
+    return limpio, rechazadas, huellas(limpio, bloque)
+
+# Agregación al grano mensual. Sirve tanto para los parciales de cada bloque
+# como para consolidar los parciales (la suma de sumas es la suma).
+def agregar(bloque):
+    return bloque.groupby(GRANO, sort=False)[MEDIDAS].sum().reset_index()
+
+# Atributos de cada producto (primer registro de cada art_codi)
+def productos(bloque):
+    return bloque.drop_duplicates('art_codi')[['art_codi'] + ATRIBUTOS]
+
+def _agregar_bloque(bloque):
+    return agregar(bloque), productos(bloque)
+
+# Fecha del primer día del mes, aritmética sobre meses desde 1970 (sin pasar por texto)
+def fecha_mensual(anio, mes):
+    meses = (np.asarray(anio, dtype=np.int64) - 1970) * 12 + np.asarray(mes, dtype=np.int64) - 1
+    return meses.astype('datetime64[M]').astype('datetime64[ns]')
+
+# art_codi vuelve a ser entero si todos los códigos lo son (como lo infiere read_csv)
+def _codigos_producto(codigos):
+    numericos = pd.to_numeric(codigos, errors='coerce')
+    if numericos.notna().all() and (numericos % 1 == 0).all():
+        return numericos.astype(np.int64)
+    return codigos
+
+def _medido(estadisticas, etapa, funcion, bloque):
+    inicio = time.perf_counter()
+    resultado = funcion(bloque)
+    salida = resultado[0] if isinstance(resultado, tuple) else resultado
+    estadisticas.registrar(etapa, len(bloque), len(salida), time.perf_counter() - inicio)
+    return resultado
+
+def ingerir_ventas(ruta, filas_por_bloque=FILAS_POR_BLOQUE, hilos=MAX_HILOS, deduplicar=True):
+    estadisticas = _Estadisticas()
+    inicio_total = time.perf_counter()
+
+    columnas = pd.read_csv(ruta, nrows=0).columns
+    faltantes = [c for c in OBLIGATORIAS if c not in columnas and not (c in ('anio', 'mes') and 'fecha' in columnas)]
+    if faltantes:
+        raise ValueError(f"Faltan columnas obligatorias en {ruta}: {', '.join(faltantes)}")
+
+    deduplicador = Deduplicador()
+    parciales, rechazos = [], []
+    # Bloques en vuelo acotados para que la lectura no se adelante sin límite
+    pendientes = deque()
+
+    def consumir(bloque, futuro):
+        limpio, rechazadas, claves = futuro.result()
+        rechazos.append(rechazadas)
+        if deduplicar:
+            inicio = time.perf_counter()
+            # Duplicados dentro del bloque y contra los bloques anteriores
+            nuevas = deduplicador.nuevas(claves)
+            estadisticas.registrar('deduplicacion', len(limpio), int(nuevas.sum()), time.perf_counter() - inicio)
+            # Las filas descartadas se informan junto a las rechazadas
+            if not nuevas.all():
+                descartadas = limpio.index[~nuevas]
+                rechazos.append(bloque.loc[descartadas].assign(linea=descartadas.to_numpy() + 2, motivo='duplicado'))
+            limpio = limpio[nuevas]
+        parciales.append(executor.submit(_medido, estadisticas, 'agregacion', _agregar_bloque, limpio))
+
+    with ThreadPoolExecutor(max_workers=hilos) as executor:
+        # Todo se lee como texto (los códigos conservan ceros a la izquierda y las
+        # huellas no dependen del tipo inferido en cada bloque) salvo las columnas
+        # numéricas, que se infieren y validan; lo que no sea numérico queda como texto
+        tipos = {columna: str for columna in columnas if columna not in NUMERICAS}
+        lector = pd.read_csv(ruta, dtype=tipos, chunksize=filas_por_bloque)
+        while True:
+            inicio = time.perf_counter()
+            bloque = next(lector, None)
+            if bloque is None:
+                break
+            estadisticas.registrar('lectura', len(bloque), len(bloque), time.perf_counter() - inicio)
+            pendientes.append((bloque, executor.submit(_medido, estadisticas, 'validacion', validar_bloque, bloque)))
+            while len(pendientes) > hilos:
+                consumir(*pendientes.popleft())
+        while pendientes:
+            consumir(*pendientes.popleft())
+        parciales = [futuro.result() for futuro in parciales]
+
+    inicio = time.perf_counter()
+    agregados = pd.concat([agregado for agregado, _ in parciales], ignore_index=True)
+    # Sin sort: los hechos quedan en el orden de primera aparición en el archivo
+    hechos = agregar(agregados)
+    catalogo = productos(pd.concat([atributos for _, atributos in parciales], ignore_index=True))
+    posiciones = pd.Index(catalogo['art_codi']).get_indexer(hechos['art_codi'])
+    # Los tipos se resuelven sobre el catálogo (un registro por producto) y se reparten
+    catalogo['art_codi'] = _codigos_producto(catalogo['art_codi'])
+    for columna in ['art_codi'] + ATRIBUTOS:
+        hechos[columna] = catalogo[columna].take(posiciones).to_numpy()
+    if (hechos['cantidad_total'] % 1 == 0).all():
+        hechos['cantidad_total'] = hechos['cantidad_total'].astype(np.int64)
+    hechos['fecha'] = fecha_mensual(hechos['anio'], hechos['mes'])
+    estadisticas.registrar('consolidacion', len(agregados), len(hechos), time.perf_counter() - inicio)
+
+    rechazadas = pd.concat(rechazos, ignore_index=True).sort_values('linea', kind='stable', ignore_index=True)
+    duplicadas = int((rechazadas['motivo'] == 'duplicado').sum())
+    tabla = estadisticas.tabla()
+    total = time.perf_counter() - inicio_total
+    filas_leidas = estadisticas.etapas['lectura']['filas_entrada'] if 'lectura' in estadisticas.etapas else 0
+    return {
+        'hechos': hechos,
+        'rechazadas': rechazadas,
+        'estadisticas': tabla,
+        'resumen': {
+            'filas_leidas': filas_leidas,
+            'filas_rechazadas': len(rechazadas) - duplicadas,
+            'filas_duplicadas': duplicadas,
+            'filas_hechos': len(hechos),
+            'segundos': total,
+            'filas_por_segundo': filas_leidas / total if total > 0 else float('nan'),
+        },
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Valida, deduplica y agrega un CSV de ventas al grano mensual")
+    parser.add_argument('ventas', help="CSV de hechos de ventas (cualquier grano)")
+    parser.add_argument('--salida', help="CSV de hechos mensuales resultante")
+    parser.add_argument('--rechazadas', help="CSV con las filas rechazadas o duplicadas y su motivo")
+    parser.add_argument('--filas-por-bloque', type=int, default=FILAS_POR_BLOQUE)
+    parser.add_argument('--hilos', type=int, default=MAX_HILOS)
+    parser.add_argument('--sin-deduplicar', action='store_true')
+    args = parser.parse_args(argv)
+
+    resultado = ingerir_ventas(args.ventas, args.filas_por_bloque, args.hilos, not args.sin_deduplicar)
+    print(resultado['estadisticas'].to_string(index=False, float_format=lambda x: f"{x:,.2f}"))
+    resumen = resultado['resumen']
+    print(f"{resumen['filas_leidas']:,} filas leídas, {resumen['filas_rechazadas']:,} rechazadas, "
+          f"{resumen['filas_duplicadas']:,} duplicadas, "
+          f"{resumen['filas_hechos']:,} hechos mensuales en {resumen['segundos']:.2f} s "
+          f"({resumen['filas_por_segundo']:,.0f} filas/s)")
+
+    if args.salida:
+        resultado['hechos'].drop(columns='fecha').to_csv(args.salida, index=False)
+    if args.rechazadas:
+        resultado['rechazadas'].to_csv(args.rechazadas, index=False)
+
+if __name__ == '__main__':
+    main()
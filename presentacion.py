@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+
+# Capa de presentación vectorizada: agrupación en "Otros" y formato de
+# etiquetas/colores sobre arreglos NumPy completos, sin apply() fila a fila.
+
+# Escalas para formatear_valor / formatear_valores (umbral, divisor, sufijo)
+ESCALAS = (
+    (1e12, 1e12, ' billones'),
+    (1e9, 1e9, ' mil millones'),
+    (1e6, 1e6, ' millones'),
+    (1e3, 1e3, ' mil'),
+)
+
+def formatear_valor(valor):
+    for umbral, divisor, sufijo in ESCALAS:
+        if valor >= umbral:
+            return f"${valor / divisor:.2f}{sufijo}"
+    return f"${valor:,.2f}"
+
+# Inserta un valor en un arreglo ampliando el dtype si hace falta
+def _insertar(arreglo, posicion, valor):
+    if valor is None:
+        if arreglo.dtype.kind in 'iub':
+            arreglo = arreglo.astype(float)
+        valor = np.nan if arreglo.dtype.kind in 'fc' else None
+    elif isinstance(valor, str) and arreglo.dtype.kind != 'O':
+        arreglo = arreglo.astype(object)
+    return np.insert(arreglo, posicion, valor)
+
+# Función para agrupar valores pequeños en "Otros".
+# Los porcentajes y la separación grandes/pequeños se calculan sobre el arreglo
+# de valores; solo se copian las filas grandes y "Otros" se inserta en su
+# posición con searchsorted en lugar de concatenar y reordenar DataFrames.
+def agrupar_pequenos(df, columna_categoria, columna_valor, umbral_porcentaje=4):
+    valores = df[columna_valor].to_numpy(dtype=float)
+    total = valores.sum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        porcentaje = valores / total * 100
+
+    pequenos = porcentaje < umbral_porcentaje
+    grandes = np.flatnonzero(porcentaje >= umbral_porcentaje)
+    grandes = grandes[np.argsort(-valores[grandes], kind='stable')]
+
+    resultado = df.take(grandes).reset_index(drop=True)
+    resultado['porcentaje'] = porcentaje[grandes]
+
+    # Si hay categorías pequeñas, agruparlas en una sola fila
+    if pequenos.any():
+        valor_otros = valores[pequenos].sum()
+        posicion = np.searchsorted(-valores[grandes], -valor_otros, side='right')
+        fila_otros = {
+            columna_categoria: 'Otros',
+            columna_valor: valor_otros,
+            'porcentaje': porcentaje[pequenos].sum(),
+        }
+        resultado = pd.DataFrame({
+            columna: _insertar(resultado[columna].to_numpy(), posicion, fila_otros.get(columna))
+            for columna in resultado.columns
+        })
+
+    return resultado
+
+# Aplica una plantilla de formato a todos los valores de una vez
+def _formatear(plantilla, valores):
+    return list(map(plantilla.format, valores.tolist()))
+
+# Versión vectorizada de formatear_valor para columnas completas: las escalas
+# se asignan con máscaras y cada grupo se formatea en bloque
+def formatear_valores(valores):
+    valores = np.asarray(valores, dtype=float)
+    textos = np.empty(len(valores), dtype=object)
+    restantes = np.ones(len(valores), dtype=bool)
+    for umbral, divisor, sufijo in ESCALAS:
+        mascara = restantes & (valores >= umbral)
+        textos[mascara] = _formatear(f"${{:.2f}}{sufijo}", valores[mascara] / divisor)
+        restantes &= ~mascara
+    textos[restantes] = _formatear("${:,.2f}", valores[restantes])
+    return textos
+
+# "$1,234.56" para cada valor (etiquetas de barras)
+def formatear_moneda(valores):
+    return _formatear("${:,.2f}", np.asarray(valores, dtype=float))
+
+# "1,234" para cada cantidad entera
+def formatear_miles(valores):
+    return _formatear("{:,}", np.asarray(valores))
+
+# "12.3%" para cada porcentaje
+def formatear_porcentajes(valores, decimales=1):
+    return _formatear(f"{{:.{decimales}f}}%", np.asarray(valores, dtype=float))
+
+# Color por signo: positivo si el valor es > 0, negativo en otro caso (incluye NaN)
+def colores_signo(valores, positivo='green', negativo='red'):
+    return np.where(np.asarray(valores, dtype=float) > 0, positivo, negativo)
@@ -1,13 +1,56 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-import numpy as np
+import os
 import base64
 from io import BytesIO
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 import calendar
 
+from analisis import (
+    MESES,
+    filtrar_datos,
+    calcular_kpis,
+    calcular_tendencia,
+    calcular_mapa_calor,
+    calcular_comparacion,
+    calcular_top_clientes,
+    calcular_frecuencia,
+    calcular_segmentacion,
+    calcular_penetracion,
+    calcular_top_productos,
+    ETIQUETAS_NIVEL,
+)
+from series_tiempo import TOTAL
+from canasta import NIVELES_CANASTA, matriz_lift
+from cuantiles import cuantiles, histograma
+from agregados import (
+    MB,
+    RUTA_VENTAS,
+    INGESTAS,
+    datos_compartidos,
+    tamaño_bytes,
+    metricas_caches,
+    memoria_proceso_mb,
+    arbol_categorias,
+    calcular_crecimiento,
+    calcular_estacionalidad,
+    calcular_distribuciones,
+    canasta_filtrada,
+)
+from api import iniciar_en_segundo_plano
+from presentacion import (
+    agrupar_pequenos,
+    formatear_valor,
+    formatear_valores,
+    formatear_moneda,
+    formatear_miles,
+    formatear_porcentajes,
+    colores_signo,
+)
+
 # Configuración de la página
 st.set_page_config(
     page_title="Dashboard de Ventas",
@@ -15,243 +58,137 @@ st.set_page_config(
     layout="wide"
 )
 
-# Mapeo de números de mes a nombres
-MESES = {
-    1: 'Enero', 2: 'Febrero', 3: 'Marzo', 4: 'Abril', 
-    5: 'Mayo', 6: 'Junio', 7: 'Julio', 8: 'Agosto',
-    9: 'Septiembre', 10: 'Octubre', 11: 'Noviembre', 12: 'Diciembre'
+# Número de hilos para calcular secciones en paralelo
+MAX_HILOS = min(8, os.cpu_count() or 1)
+
+# Nombres visibles de los niveles del drill-down
+NOMBRES_NIVEL = {'categoria': 'Categoría', 'subcategoria': 'Subcategoría', 'art_codi': 'Producto'}
+
+# Renderizado progresivo: cada sección pesada reserva un espacio en la página
+# y se rellena cuando su cálculo termina, sin esperar a las demás.
+def seccion_pendiente():
+    placeholder = st.empty()
+    placeholder.info("⏳ Calculando...")
+    return placeholder
+
+def _rellenar(placeholder, mostrar, obtener_resultado):
+    with placeholder.container():
+        try:
+            mostrar(obtener_resultado())
+        except Exception as e:
+            st.error(f"Error al calcular la sección: {e}")
+
+# Un solo pool de hilos para todo el proceso, compartido por las sesiones: las
+# ejecuciones interrumpidas no dejan pools propios compitiendo por la CPU
+@st.cache_resource
+def ejecutor_secciones():
+    return ThreadPoolExecutor(max_workers=MAX_HILOS, thread_name_prefix='secciones')
+
+def renderizar_secciones(secciones, progresivo=True):
+    # secciones: lista de (placeholder, funcion_calculo, argumentos, funcion_mostrar).
+    # Los cálculos (pandas/NumPy) corren en hilos; las llamadas a st.* se hacen
+    # siempre desde el hilo principal, en el orden en que terminan.
+    if not progresivo:
+        for placeholder, calculo, argumentos, mostrar in secciones:
+            _rellenar(placeholder, mostrar, partial(calculo, *argumentos))
+        return
+
+    # Los cálculos no usan st.*: las cachés compartidas están en agregados.py
+    executor = ejecutor_secciones()
+    futuros = {}
+    try:
+        futuros = {
+            executor.submit(calculo, *argumentos): (placeholder, mostrar)
+            for placeholder, calculo, argumentos, mostrar in secciones
+        }
+        for futuro in as_completed(futuros):
+            # Se suelta cada resultado en cuanto se dibuja, sin esperar a los demás
+            placeholder, mostrar = futuros.pop(futuro)
+            _rellenar(placeholder, mostrar, futuro.result)
+    finally:
+        # Si Streamlit interrumpe la ejecución (RerunException/StopException al
+        # cambiar un filtro), se cancelan los cálculos de esta ejecución que aún
+        # no empezaron; los demás terminan en el pool compartido sin esperarlos
+        for futuro in futuros:
+            futuro.cancel()
+
+# Funciones de visualización de cada sección
+# Métricas de crecimiento disponibles: columna de la serie -> etiqueta
+METRICAS_CRECIMIENTO = {
+    'crecimiento': '% Crecimiento Mes a Mes',
+    'crecimiento_anual': '% Crecimiento Año contra Año',
 }
 
-# Función para agrupar valores pequeños en "Otros"
-def agrupar_pequenos(df, columna_categoria, columna_valor, umbral_porcentaje=4):
-    # Calcular el total
-    total = df[columna_valor].sum()
-    
-    # Calcular el porcentaje que representa cada categoría
-    df_con_porcentaje = df.copy()
-    df_con_porcentaje['porcentaje'] = df_con_porcentaje[columna_valor] / total * 100
-    
-    # Separar categorías grandes y pequeñas
-    grandes = df_con_porcentaje[df_con_porcentaje['porcentaje'] >= umbral_porcentaje]
-    pequenos = df_con_porcentaje[df_con_porcentaje['porcentaje'] < umbral_porcentaje]
-    
-    # Si hay categorías pequeñas, agruparlas
-    if not pequenos.empty:
-        otros = pd.DataFrame({
-            columna_categoria: ['Otros'],
-            columna_valor: [pequenos[columna_valor].sum()],
-            'porcentaje': [pequenos['porcentaje'].sum()]
-        })
-        # Combinar grandes y otros
-        resultado = pd.concat([grandes, otros], ignore_index=True)
-    else:
-        resultado = grandes
-    
-    return resultado.sort_values(columna_valor, ascending=False)
-
-# Sidebar para filtros
-st.sidebar.title("Filtros")
-
-# Cargar datos
-@st.cache_data
-def load_data():
-    # Cargar ventas
-    df = pd.read_csv(r"C:\Users\ACER\OneDrive\Documentos\rompecabezas\dimensiones\Hechos_Ventas_Agrupado.csv")
-    df['fecha'] = pd.to_datetime(df['anio'].astype(str) + '-' + df['mes'].astype(str) + '-01')
-    df['cod_clte'] = df['cod_clte'].astype(str)
-
-    # Cargar clientes
-    df_clientes = pd.read_csv(r"C:\Users\ACER\OneDrive\Documentos\rompecabezas\dimensiones\Dim_Cliente.csv", dtype={'cod_clte': str})
-
-    return df, df_clientes
-
-try:
-    df, df_clientes = load_data()
-    data_load_state = st.sidebar.success('Datos cargados correctamente!')
-except Exception as e:
-    st.sidebar.error(f'Error al cargar los datos: {e}')
-    st.stop()
-
-# Filtros interactivos en sidebar
-años_disponibles = sorted(df['anio'].unique())
-categorias_disponibles = sorted(df['categoria'].unique())
-
-# Filtro de año
-años_seleccionados = st.sidebar.multiselect(
-    "Seleccionar Años",
-    años_disponibles,
-    default=años_disponibles[-1:]  # Por defecto, el último año
-)
-
-# Filtro de categoría
-categorias_seleccionadas = st.sidebar.multiselect(
-    "Seleccionar Categorías",
-    categorias_disponibles,
-    default=[]  # Por defecto, todas las categorías
-)
-
-# Aplicar filtros
-if años_seleccionados:
-    df_filtrado = df[df['anio'].isin(años_seleccionados)]
-else:
-    df_filtrado = df
-
-if categorias_seleccionadas:
-    df_filtrado = df_filtrado[df_filtrado['categoria'].isin(categorias_seleccionadas)]
-
-# Filtro para comparación de períodos
-st.sidebar.subheader("Comparación de Períodos")
-comparar_periodos = st.sidebar.checkbox("Activar comparación de períodos")
-
-if comparar_periodos:
-    col1, col2 = st.sidebar.columns(2)
-    with col1:
-        periodo1_año = st.selectbox("Año 1", años_disponibles, index=len(años_disponibles)-2 if len(años_disponibles) > 1 else 0)
-        periodo1_mes = st.selectbox("Mes 1", range(1, 13), index=0, format_func=lambda x: MESES[x])
-    with col2:
-        periodo2_año = st.selectbox("Año 2", años_disponibles, index=len(años_disponibles)-1)
-        periodo2_mes = st.selectbox("Mes 2", range(1, 13), index=0, format_func=lambda x: MESES[x])
-
-# Título
-st.title('Dashboard de Análisis de Ventas')
-st.markdown("""
-Este dashboard proporciona un análisis completo de las ventas, permitiendo visualizar tendencias, 
-identificar patrones y segmentar clientes para tomar decisiones estratégicas basadas en datos.
-""")
-
-# KPIs
-st.header('KPIs Generales')
-st.markdown("""
-Los siguientes indicadores muestran el rendimiento general de las ventas en el período seleccionado.
-""")
-
-col1, col2, col3, col4, col5 = st.columns(5)
-
-valor_total = df_filtrado['valor_total'].sum()
-cantidad_total = df_filtrado['cantidad_total'].sum()
-ticket_promedio = valor_total / len(df_filtrado) if len(df_filtrado) > 0 else 0
-clientes_unicos = df_filtrado['cod_clte'].nunique()
-productos_unicos = df_filtrado['art_codi'].nunique()
-
-def formatear_valor(valor):
-    if valor >= 1e12:
-        return f"${valor / 1e12:.2f} billones"
-    elif valor >= 1e9:
-        return f"${valor / 1e9:.2f} mil millones"
-    elif valor >= 1e6:
-        return f"${valor / 1e6:.2f} millones"
-    elif valor >= 1e3:
-        return f"${valor / 1e3:.2f} mil"
-    else:
-        return f"${valor:,.2f}"
-
-with col1:
-    st.metric("Valor Total", formatear_valor(valor_total))
-with col2:
-    st.metric("Cantidad Total", formatear_valor(cantidad_total))
-with col3:
-    st.metric("Ticket Promedio", formatear_valor(ticket_promedio))
-with col4:
-    st.metric("Clientes Únicos", f"{clientes_unicos:,}")
-with col5:
-    st.metric("Productos Únicos", f"{productos_unicos:,}")
-
-# Tasa de Crecimiento (Mes a Mes con Filtro de Año)
-st.header('Tasa de Crecimiento')
-st.markdown("""
-Este gráfico muestra la evolución de las ventas mes a mes y el porcentaje de crecimiento respecto al mes anterior.
-Las barras verdes indican crecimiento positivo, mientras que las rojas señalan decrecimiento.
-""")
-
-# Selector de año para tasa de crecimiento
-año_crecimiento = st.selectbox(
-    "Seleccionar Año para Análisis de Crecimiento",
-    años_disponibles,
-    index=len(años_disponibles)-1
-)
-
-# Calcular tasa de crecimiento mensual
-df_año = df[df['anio'] == año_crecimiento]
-ventas_mensuales = df_año.groupby('mes')['valor_total'].sum().reset_index()
-ventas_mensuales['crecimiento'] = ventas_mensuales['valor_total'].pct_change() * 100
-
-# Añadir nombres de meses
-ventas_mensuales['nombre_mes'] = ventas_mensuales['mes'].map(MESES)
-
-# Crear gráfico combinado (línea para ventas, barras para crecimiento)
-fig_crecimiento = go.Figure()
-
-# Añadir línea de ventas
-fig_crecimiento.add_trace(
-    go.Scatter(
-        x=ventas_mensuales['nombre_mes'], 
-        y=ventas_mensuales['valor_total'],
-        mode='lines+markers',
-        name='Ventas Mensuales',
-        line=dict(color='royalblue', width=3)
+def mostrar_crecimiento(ventas_mensuales, año_crecimiento, metrica='crecimiento', categoria=TOTAL):
+    # Crear gráfico combinado (línea para ventas, barras para crecimiento)
+    fig_crecimiento = go.Figure()
+
+    # Añadir línea de ventas
+    fig_crecimiento.add_trace(
+        go.Scatter(
+            x=ventas_mensuales['nombre_mes'],
+            y=ventas_mensuales['valor_total'],
+            mode='lines+markers',
+            name='Ventas Mensuales',
+            line=dict(color='royalblue', width=3)
+        )
     )
-)
 
-# Añadir barras de crecimiento
-fig_crecimiento.add_trace(
-    go.Bar(
-        x=ventas_mensuales['nombre_mes'],
-        y=ventas_mensuales['crecimiento'],
-        name='% Crecimiento',
-        marker_color=ventas_mensuales['crecimiento'].apply(
-            lambda x: 'green' if x > 0 else 'red'
-        ),
-        yaxis='y2'
+    # Añadir media móvil de 3 meses (incluye los meses del año anterior)
+    fig_crecimiento.add_trace(
+        go.Scatter(
+            x=ventas_mensuales['nombre_mes'],
+            y=ventas_mensuales['movil_3'],
+            mode='lines',
+            name='Media Móvil 3 Meses',
+            line=dict(color='lightslategray', width=2, dash='dot')
+        )
     )
-)
-
-# Configurar ejes y layout
-fig_crecimiento.update_layout(
-    title=f'Crecimiento Mensual de Ventas en {año_crecimiento}',
-    xaxis=dict(title='Mes', categoryorder='array', categoryarray=list(MESES.values())),
-    yaxis=dict(title='Valor Total ($)', side='left'),
-    yaxis2=dict(title='% Crecimiento', side='right', overlaying='y', showgrid=False),
-    legend=dict(x=0.01, y=0.99),
-    hovermode='x unified'
-)
 
-# Añadir línea de referencia en 0% para el crecimiento
-fig_crecimiento.add_shape(
-    type='line',
-    x0=0,
-    y0=0,
-    x1=1,
-    y1=0,
-    yref='y2',
-    xref='paper',
-    line=dict(color='gray', width=1, dash='dash')
-)
+    # Añadir barras de crecimiento
+    fig_crecimiento.add_trace(
+        go.Bar(
+            x=ventas_mensuales['nombre_mes'],
+            y=ventas_mensuales[metrica],
+            name=METRICAS_CRECIMIENTO[metrica],
+            marker_color=colores_signo(ventas_mensuales[metrica]),
+            yaxis='y2'
+        )
+    )
 
-st.plotly_chart(fig_crecimiento, use_container_width=True)
+    # Configurar ejes y layout
+    fig_crecimiento.update_layout(
+        title=f'Crecimiento Mensual de Ventas en {año_crecimiento}' + (f' - {categoria}' if categoria != TOTAL else ''),
+        xaxis=dict(title='Mes', categoryorder='array', categoryarray=list(MESES.values())),
+        yaxis=dict(title='Valor Total ($)', side='left'),
+        yaxis2=dict(title='% Crecimiento', side='right', overlaying='y', showgrid=False),
+        legend=dict(x=0.01, y=0.99),
+        hovermode='x unified'
+    )
 
-# Análisis Temporal
-st.header('Análisis Temporal')
-st.markdown("""
-Estos gráficos muestran la evolución de las ventas a lo largo del tiempo y la distribución por mes y año.
-La tendencia permite identificar patrones estacionales y el mapa de calor facilita la comparación entre períodos.
-""")
+    # Añadir línea de referencia en 0% para el crecimiento
+    fig_crecimiento.add_shape(
+        type='line',
+        x0=0,
+        y0=0,
+        x1=1,
+        y1=0,
+        yref='y2',
+        xref='paper',
+        line=dict(color='gray', width=1, dash='dash')
+    )
 
-col1, col2 = st.columns(2)
+    st.plotly_chart(fig_crecimiento, use_container_width=True)
 
-with col1:
-    # Tendencia de ventas
-    ventas_tiempo = df_filtrado.groupby(['fecha']).agg({
-        'valor_total': 'sum'
-    }).reset_index()
-    
+def mostrar_tendencia(ventas_tiempo):
     fig = px.line(
-        ventas_tiempo, 
-        x='fecha', 
+        ventas_tiempo,
+        x='fecha',
         y='valor_total',
         title='Tendencia de Ventas por Mes',
         labels={'valor_total': 'Valor Total ($)', 'fecha': 'Fecha'}
     )
-    
+
     fig.update_layout(
         hovermode='x unified',
         xaxis=dict(
@@ -259,240 +196,149 @@ with col1:
             tickangle=-45
         )
     )
-    
+
     st.plotly_chart(fig, use_container_width=True)
 
-with col2:
-    # Mapa de calor por mes y año
-    heatmap_data = df_filtrado.groupby(['anio', 'mes']).agg({
-        'valor_total': 'sum'
-    }).reset_index()
-    
-    if not heatmap_data.empty:
-        pivot_data = heatmap_data.pivot(index='anio', columns='mes', values='valor_total')
-        
-        # Obtener las columnas reales (meses) presentes en los datos
-        meses_presentes = sorted(pivot_data.columns)
-        
-        # Crear etiquetas de meses con nombres
-        etiquetas_meses = [MESES.get(m, f"Mes {m}") for m in meses_presentes]
-        
-        fig = px.imshow(
-            pivot_data,
-            labels=dict(x="Mes", y="Año", color="Valor Total"),
-            x=etiquetas_meses,
-            y=pivot_data.index,
-            title="Mapa de Calor de Ventas por Mes y Año",
-            color_continuous_scale="Viridis"
-        )
-        
-        fig.update_layout(
-            xaxis=dict(side='bottom')
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
-    else:
+def mostrar_mapa_calor(pivot_data):
+    if pivot_data is None:
         st.warning("No hay suficientes datos para generar el mapa de calor.")
+        return
 
-# Índice de Estacionalidad
-st.header('Índice de Estacionalidad')
-st.markdown("""
-Este gráfico muestra qué meses tienen ventas por encima o por debajo del promedio anual.
-Un índice mayor a 1.0 indica que el mes tiene ventas superiores al promedio, mientras que 
-valores menores a 1.0 indican ventas por debajo del promedio. Es útil para identificar 
-patrones estacionales y planificar estrategias específicas para cada período.
-""")
+    # Obtener las columnas reales (meses) presentes en los datos
+    meses_presentes = sorted(pivot_data.columns)
 
-# Calcular índice de estacionalidad
-ventas_por_mes = df.groupby('mes')['valor_total'].sum()
-promedio_mensual = ventas_por_mes.mean()
-indice_estacionalidad = (ventas_por_mes / promedio_mensual).reset_index()
-indice_estacionalidad.columns = ['mes', 'indice']
-
-# Añadir nombres de meses
-indice_estacionalidad['nombre_mes'] = indice_estacionalidad['mes'].map(MESES)
-
-# Crear gráfico de estacionalidad
-fig_estacionalidad = px.bar(
-    indice_estacionalidad,
-    x='nombre_mes',
-    y='indice',
-    title='Índice de Estacionalidad por Mes',
-    labels={'indice': 'Índice (1.0 = Promedio)', 'nombre_mes': 'Mes'},
-    color='indice',
-    color_continuous_scale=['red', 'yellow', 'green'],
-    range_color=[0.5, 1.5]
-)
+    # Crear etiquetas de meses con nombres
+    etiquetas_meses = [MESES.get(m, f"Mes {m}") for m in meses_presentes]
 
-# Ordenar meses cronológicamente
-fig_estacionalidad.update_layout(
-    xaxis=dict(
-        categoryorder='array', 
-        categoryarray=list(MESES.values())
-    ),
-    yaxis=dict(range=[0, max(indice_estacionalidad['indice']) * 1.1])
-)
+    fig = px.imshow(
+        pivot_data,
+        labels=dict(x="Mes", y="Año", color="Valor Total"),
+        x=etiquetas_meses,
+        y=pivot_data.index,
+        title="Mapa de Calor de Ventas por Mes y Año",
+        color_continuous_scale="Viridis"
+    )
 
-# Añadir línea de referencia en 1.0
-fig_estacionalidad.add_shape(
-    type='line',
-    x0=-0.5,
-    y0=1,
-    x1=11.5,
-    y1=1,
-    line=dict(color='black', width=1, dash='dash')
-)
+    fig.update_layout(
+        xaxis=dict(side='bottom')
+    )
 
-st.plotly_chart(fig_estacionalidad, use_container_width=True)
+    st.plotly_chart(fig, use_container_width=True)
+
+def mostrar_estacionalidad(indice_estacionalidad):
+    # Crear gráfico de estacionalidad
+    fig_estacionalidad = px.bar(
+        indice_estacionalidad,
+        x='nombre_mes',
+        y='indice',
+        title='Índice de Estacionalidad por Mes',
+        labels={'indice': 'Índice (1.0 = Promedio)', 'nombre_mes': 'Mes'},
+        color='indice',
+        color_continuous_scale=['red', 'yellow', 'green'],
+        range_color=[0.5, 1.5]
+    )
+
+    # Ordenar meses cronológicamente
+    fig_estacionalidad.update_layout(
+        xaxis=dict(
+            categoryorder='array',
+            categoryarray=list(MESES.values())
+        ),
+        yaxis=dict(range=[0, max(indice_estacionalidad['indice']) * 1.1])
+    )
+
+    # Añadir línea de referencia en 1.0
+    fig_estacionalidad.add_shape(
+        type='line',
+        x0=-0.5,
+        y0=1,
+        x1=11.5,
+        y1=1,
+        line=dict(color='black', width=1, dash='dash')
+    )
+
+    st.plotly_chart(fig_estacionalidad, use_container_width=True)
+
+def mostrar_comparacion(comparacion, periodo1, periodo2):
+    (periodo1_año, periodo1_mes), (periodo2_año, periodo2_mes) = periodo1, periodo2
+    kpi_periodo2 = comparacion['kpi_periodo2']
 
-# Comparación de períodos si está activada
-if comparar_periodos:
-    st.header('Comparación de Períodos')
-    st.markdown(f"""
-    Esta sección compara los KPIs y la distribución de ventas entre dos períodos seleccionados:
-    **{MESES[periodo1_mes]} {periodo1_año}** vs **{MESES[periodo2_mes]} {periodo2_año}**.
-    Los porcentajes muestran la variación entre ambos períodos.
-    """)
-    
-    # Filtrar datos para los períodos seleccionados
-    df_periodo1 = df[(df['anio'] == periodo1_año) & (df['mes'] == periodo1_mes)]
-    df_periodo2 = df[(df['anio'] == periodo2_año) & (df['mes'] == periodo2_mes)]
-    
-    # Calcular KPIs para ambos períodos
-    kpi_periodo1 = {
-        'valor_total': df_periodo1['valor_total'].sum(),
-        'cantidad_total': df_periodo1['cantidad_total'].sum(),
-        'clientes_unicos': df_periodo1['cod_clte'].nunique()
-    }
-    
-    kpi_periodo2 = {
-        'valor_total': df_periodo2['valor_total'].sum(),
-        'cantidad_total': df_periodo2['cantidad_total'].sum(),
-        'clientes_unicos': df_periodo2['cod_clte'].nunique()
-    }
-    
-    # Calcular diferencias porcentuales
-    diff_valor = ((kpi_periodo2['valor_total'] / kpi_periodo1['valor_total']) - 1) * 100 if kpi_periodo1['valor_total'] > 0 else 0
-    diff_cantidad = ((kpi_periodo2['cantidad_total'] / kpi_periodo1['cantidad_total']) - 1) * 100 if kpi_periodo1['cantidad_total'] > 0 else 0
-    diff_clientes = ((kpi_periodo2['clientes_unicos'] / kpi_periodo1['clientes_unicos']) - 1) * 100 if kpi_periodo1['clientes_unicos'] > 0 else 0
-    
     # Mostrar comparación
     col1, col2, col3 = st.columns(3)
-    
+
     with col1:
         st.metric(
             f"Valor Total",
             f"${kpi_periodo2['valor_total']:,.2f}",
-            f"{diff_valor:+.1f}% vs {MESES[periodo1_mes]} {periodo1_año}"
+            f"{comparacion['diff_valor']:+.1f}% vs {MESES[periodo1_mes]} {periodo1_año}"
         )
-    
+
     with col2:
         st.metric(
             f"Cantidad Total",
             f"{kpi_periodo2['cantidad_total']:,}",
-            f"{diff_cantidad:+.1f}% vs {MESES[periodo1_mes]} {periodo1_año}"
+            f"{comparacion['diff_cantidad']:+.1f}% vs {MESES[periodo1_mes]} {periodo1_año}"
         )
-    
+
     with col3:
         st.metric(
             f"Clientes Únicos",
             f"{kpi_periodo2['clientes_unicos']:,}",
-            f"{diff_clientes:+.1f}% vs {MESES[periodo1_mes]} {periodo1_año}"
+            f"{comparacion['diff_clientes']:+.1f}% vs {MESES[periodo1_mes]} {periodo1_año}"
         )
-    
+
     # Gráfico comparativo de categorías
-    cat_periodo1 = df_periodo1.groupby('categoria')['valor_total'].sum().reset_index()
-    cat_periodo1['periodo'] = f"{MESES[periodo1_mes]} {periodo1_año}"
-    
-    cat_periodo2 = df_periodo2.groupby('categoria')['valor_total'].sum().reset_index()
-    cat_periodo2['periodo'] = f"{MESES[periodo2_mes]} {periodo2_año}"
-    
-    # Agrupar categorías pequeñas
-    cat_periodo1 = agrupar_pequenos(cat_periodo1, 'categoria', 'valor_total')
-    cat_periodo2 = agrupar_pequenos(cat_periodo2, 'categoria', 'valor_total')
-    
-    cat_comparacion = pd.concat([cat_periodo1, cat_periodo2])
-    
     fig_cat_comp = px.bar(
-        cat_comparacion,
+        comparacion['cat_comparacion'],
         x='categoria',
         y='valor_total',
         color='periodo',
         barmode='group',
         title=f'Comparación de Ventas por Categoría: {MESES[periodo1_mes]} {periodo1_año} vs {MESES[periodo2_mes]} {periodo2_año}'
     )
-    
+
     fig_cat_comp.update_layout(
         xaxis_title="Categoría",
         yaxis_title="Valor Total ($)",
         bargap=0.3
     )
-    
-    st.plotly_chart(fig_cat_comp, use_container_width=True)
-
-# Análisis por Cliente
-st.header('Análisis por Cliente')
-st.markdown("""
-Esta sección muestra los clientes más importantes según su valor total de compras y su frecuencia.
-Permite identificar a los clientes VIP y aquellos con patrones de compra específicos.
-""")
-
-st.write("Clientes únicos en datos filtrados:", df_filtrado['cod_clte'].nunique())
-
-col1, col2 = st.columns(2)
-
-with col1:
-    # Agrupar y unir con nombres
-    top_clientes = (
-        df_filtrado.groupby('cod_clte')
-        .agg({'valor_total': 'sum'})
-        .reset_index()
-    )
-    top_clientes['cod_clte'] = top_clientes['cod_clte'].astype(str)
-    top_clientes = top_clientes.merge(df_clientes[['cod_clte', 'nom_clte']], on='cod_clte', how='left')
 
-    top_clientes = top_clientes.sort_values('valor_total', ascending=False).head(5)
-    top_clientes['cliente'] = top_clientes['nom_clte'] + ' (' + top_clientes['cod_clte'] + ')'
-
-    if not top_clientes.empty:
-        total_ventas = df_filtrado['valor_total'].sum()
-        if total_ventas > 0:
-            top_clientes['porcentaje'] = top_clientes['valor_total'] / total_ventas * 100
-
-            fig = px.pie(
-                top_clientes,
-                values='valor_total',
-                names='cliente',  # <- usamos la columna combinada
-                title='Top 5 Clientes por Participación en Ventas',
-                hole=0.4,
-                color='valor_total',
-                color_discrete_sequence=px.colors.sequential.Blues
-            )
-
-            fig.update_traces(
-                textinfo='percent+label',
-                hovertemplate='<b>Cliente: %{label}</b><br>Valor Total: %{value:$,.2f}<br>Participación: %{percent}',
-                textfont_size=14
-            )
+    st.plotly_chart(fig_cat_comp, use_container_width=True)
 
-            st.plotly_chart(fig, use_container_width=True)
+def mostrar_top_clientes(resultado):
+    top_clientes, total_ventas = resultado
 
-            st.markdown("""
-            **Interpretación:** Este gráfico muestra la participación porcentual de los 5 clientes más importantes.
-            Ideal para entender la concentración de las ventas en pocos clientes clave.
-            """)
-        else:
-            st.warning("No hay ventas en el período seleccionado.")
-    else:
+    if top_clientes.empty:
         st.warning("No hay suficientes clientes para mostrar el Top 5.")
+        return
+    if total_ventas <= 0:
+        st.warning("No hay ventas en el período seleccionado.")
+        return
+
+    fig = px.pie(
+        top_clientes,
+        values='valor_total',
+        names='cliente',  # <- usamos la columna combinada
+        title='Top 5 Clientes por Participación en Ventas',
+        hole=0.4,
+        color='valor_total',
+        color_discrete_sequence=px.colors.sequential.Blues
+    )
 
+    fig.update_traces(
+        textinfo='percent+label',
+        hovertemplate='<b>Cliente: %{label}</b><br>Valor Total: %{value:$,.2f}<br>Participación: %{percent}',
+        textfont_size=14
+    )
 
+    st.plotly_chart(fig, use_container_width=True)
 
-with col2:
-    # Histograma de frecuencia de compra
-    frecuencia_distribucion = df_filtrado.groupby('cod_clte')['mes'].nunique().value_counts().sort_index().reset_index()
-    frecuencia_distribucion.columns = ['meses_activos', 'n_clientes']
+    st.markdown("""
+    **Interpretación:** Este gráfico muestra la participación porcentual de los 5 clientes más importantes.
+    Ideal para entender la concentración de las ventas en pocos clientes clave.
+    """)
 
+def mostrar_frecuencia(frecuencia_distribucion):
     fig = px.bar(
         frecuencia_distribucion,
         x='meses_activos',
@@ -521,35 +367,59 @@ with col2:
     Es útil para entender la distribución general de la frecuencia de compra y detectar oportunidades para aumentar la recurrencia.
     """)
 
-# Segmentación de Clientes (RFM simplificado)
-st.header('Segmentación de Clientes')
-st.markdown("""
-Este análisis segmenta a los clientes según su valor (eje vertical) y frecuencia (eje horizontal).
-Permite identificar diferentes perfiles de clientes y desarrollar estrategias específicas para cada segmento:
+def _mostrar_distribucion(sketch, titulo, color):
+    mediana, p90, p99 = cuantiles(sketch)
 
-- **VIP**: Alto valor y alta frecuencia - Clientes estratégicos que requieren atención prioritaria
-- **Grandes Ocasionales**: Alto valor pero baja frecuencia - Potencial para aumentar su frecuencia de compra
-- **Frecuentes Pequeños**: Bajo valor pero alta frecuencia - Candidatos para estrategias de up-selling
-- **Pequeños**: Bajo valor y baja frecuencia - Requieren activación o pueden no ser prioritarios
-""")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Mediana", formatear_valor(mediana))
+    with col2:
+        st.metric("P90", formatear_valor(p90))
+    with col3:
+        st.metric("P99", formatear_valor(p99))
+
+    distribucion = histograma(sketch)
+    distribucion['rango'] = formatear_valores(distribucion['desde'])
+
+    fig = px.bar(
+        distribucion,
+        x='rango',
+        y='conteo',
+        title=titulo,
+        labels={'rango': 'Desde ($, escala logarítmica)', 'conteo': 'Cantidad'},
+        color_discrete_sequence=[color]
+    )
+
+    fig.update_layout(bargap=0.05)
+
+    st.plotly_chart(fig, use_container_width=True)
+
+def mostrar_distribuciones(resultado):
+    tickets, clientes = resultado
+    if tickets['n'] == 0:
+        st.warning("No hay datos para calcular las distribuciones con los filtros actuales.")
+        return
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        _mostrar_distribucion(tickets, 'Distribución del Tamaño de Ticket', 'royalblue')
 
-df_segmentacion = df_filtrado.groupby('cod_clte').agg({
-    'valor_total': 'sum',
-    'mes': 'nunique',
-}).reset_index()
-df_segmentacion['cod_clte'] = df_segmentacion['cod_clte'].astype(str)
-df_segmentacion = df_segmentacion.merge(df_clientes[['cod_clte', 'nom_clte']], on='cod_clte', how='left')
+    with col2:
+        _mostrar_distribucion(clientes, 'Distribución del Valor Total por Cliente', 'mediumpurple')
 
-if not df_segmentacion.empty:
-    df_segmentacion['valor_norm'] = df_segmentacion['valor_total'] / df_segmentacion['valor_total'].max()
-    df_segmentacion['freq_norm'] = df_segmentacion['mes'] / df_segmentacion['mes'].max()
+    st.markdown(f"""
+    **Interpretación:** La mediana y los percentiles 90 y 99 muestran el ticket y el gasto típico y extremo,
+    menos sensibles a valores atípicos que el promedio. Son aproximados con un error relativo menor al
+    {tickets['alpha']:.0%}.
+    """)
 
-    df_segmentacion['segmento'] = 'Pequeños'
-    df_segmentacion.loc[(df_segmentacion['valor_norm'] >= 0.5) & (df_segmentacion['freq_norm'] >= 0.5), 'segmento'] = 'VIP'
-    df_segmentacion.loc[(df_segmentacion['valor_norm'] >= 0.5) & (df_segmentacion['freq_norm'] < 0.5), 'segmento'] = 'Grandes Ocasionales'
-    df_segmentacion.loc[(df_segmentacion['valor_norm'] < 0.5) & (df_segmentacion['freq_norm'] >= 0.5), 'segmento'] = 'Frecuentes Pequeños'
+def mostrar_segmentacion(df_segmentacion):
+    if df_segmentacion.empty:
+        st.warning("No hay suficientes datos para la segmentación de clientes con los filtros actuales.")
+        return
 
-    df_segmentacion['valor_total_fmt'] = df_segmentacion['valor_total'].apply(formatear_valor)
+    df_segmentacion['valor_total_fmt'] = formatear_valores(df_segmentacion['valor_total'])
 
     fig_segmentacion = px.scatter(
         df_segmentacion,
@@ -595,287 +465,603 @@ if not df_segmentacion.empty:
     fig_segmentacion.add_annotation(x=0.25, y=0.25, text="Pequeños", showarrow=False, font=dict(size=14))
 
     st.plotly_chart(fig_segmentacion, use_container_width=True)
-else:
-    st.warning("No hay suficientes datos para la segmentación de clientes con los filtros actuales.")
 
+def mostrar_penetracion(penetracion_categorias):
+    # Crear gráfico de penetración
+    fig_penetracion = px.bar(
+        penetracion_categorias,
+        y='categoria',
+        x='penetracion',
+        title='Tasa de Penetración por Categoría (% de Clientes)',
+        orientation='h',
+        text=formatear_porcentajes(penetracion_categorias['penetracion']),
+        color='penetracion',
+        color_continuous_scale='Viridis'
+    )
 
-# Tasa de Penetración en el Mercado
-st.header('Tasa de Penetración en el Mercado')
-st.markdown("""
-Este gráfico muestra el porcentaje de clientes que compran cada categoría de productos.
-Una alta penetración indica que la categoría es popular entre los clientes, mientras que una baja penetración
-puede representar una oportunidad de crecimiento o un nicho específico.
-""")
+    fig_penetracion.update_layout(
+        xaxis_title="% de Clientes",
+        yaxis_title="Categoría",
+        yaxis={'categoryorder':'total ascending'}
+    )
 
-# Calcular penetración por categoría
-total_clientes = df_filtrado['cod_clte'].nunique()
-penetracion_categorias = df_filtrado.groupby('categoria')['cod_clte'].nunique().reset_index()
-penetracion_categorias.columns = ['categoria', 'clientes']
-penetracion_categorias['penetracion'] = penetracion_categorias['clientes'] / total_clientes * 100
-
-# Agrupar categorías pequeñas
-penetracion_categorias = agrupar_pequenos(penetracion_categorias, 'categoria', 'penetracion')
-
-# Crear gráfico de penetración
-fig_penetracion = px.bar(
-    penetracion_categorias,
-    y='categoria',
-    x='penetracion',
-    title='Tasa de Penetración por Categoría (% de Clientes)',
-    orientation='h',
-    text=penetracion_categorias['penetracion'].apply(lambda x: f"{x:.1f}%"),
-    color='penetracion',
-    color_continuous_scale='Viridis'
-)
+    fig_penetracion.update_traces(
+        textposition='auto',
+        textfont_size=12,
+        width=0.7  # Barras más anchas
+    )
 
-fig_penetracion.update_layout(
-    xaxis_title="% de Clientes",
-    yaxis_title="Categoría",
-    yaxis={'categoryorder':'total ascending'}
-)
+    st.plotly_chart(fig_penetracion, use_container_width=True)
 
-fig_penetracion.update_traces(
-    textposition='auto',
-    textfont_size=12,
-    width=0.7  # Barras más anchas
-)
+def mostrar_canasta(canasta):
+    nombre_nivel = NOMBRES_NIVEL[canasta['nivel']]
+    st.caption(f"{canasta['n_cestas']:,} cestas analizadas · {len(canasta['items']):,} {nombre_nivel.lower()}s")
 
-st.plotly_chart(fig_penetracion, use_container_width=True)
+    if canasta['reglas'].empty:
+        st.warning("No hay suficientes compras conjuntas para calcular la canasta con los filtros actuales.")
+        return
 
-# Análisis por Producto
-st.header('Análisis por Producto')
-st.markdown("""
-Esta sección muestra los productos más vendidos por cantidad y por valor total.
-Permite identificar los productos estrella y aquellos que generan mayor ingreso.
-""")
+    col1, col2 = st.columns(2)
 
-col1, col2 = st.columns(2)
+    with col1:
+        fig = px.imshow(
+            matriz_lift(canasta),
+            labels=dict(x=nombre_nivel, y=nombre_nivel, color="Lift"),
+            title=f'Lift entre las {nombre_nivel}s con más Cestas',
+            color_continuous_scale='RdBu',
+            color_continuous_midpoint=1.0
+        )
 
-with col1:
-    # Top productos por cantidad
-    top_productos = df_filtrado.groupby(['art_codi', 'art_desc']).agg({
-        'cantidad_total': 'sum'
-    }).sort_values('cantidad_total', ascending=False).head(10).reset_index()
-    
-    # Agrupar productos pequeños si es necesario
-    if len(top_productos) > 0:
-        total_cantidad = top_productos['cantidad_total'].sum()
-        top_productos['porcentaje'] = top_productos['cantidad_total'] / total_cantidad * 100
-    
+        st.plotly_chart(fig, use_container_width=True)
+
+    with col2:
+        reglas = canasta['reglas'].head(20).copy()
+        reglas['soporte'] = reglas['soporte'] * 100
+        reglas['confianza'] = reglas['confianza'] * 100
+
+        st.markdown("**Top 20 Combinaciones por Lift**")
+        st.dataframe(
+            reglas,
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                'antecedente': 'Si compra',
+                'consecuente': 'También compra',
+                'cestas': st.column_config.NumberColumn('Cestas', format='%d'),
+                'soporte': st.column_config.NumberColumn('Soporte', format='%.2f%%'),
+                'confianza': st.column_config.NumberColumn('Confianza', format='%.1f%%'),
+                'lift': st.column_config.NumberColumn('Lift', format='%.2f'),
+            }
+        )
+
+    st.markdown("""
+    **Interpretación:** Un lift mayor a 1.0 indica que ambos se compran juntos más de lo esperado por azar;
+    la confianza es el porcentaje de cestas con el primero que también incluyen el segundo.
+    """)
+
+def mostrar_top_productos_cantidad(top_productos):
     fig = px.bar(
         top_productos,
         y='art_desc',
         x='cantidad_total',
         title='Top 10 Productos Más Vendidos por Cantidad',
         orientation='h',
-        text=top_productos['cantidad_total'].apply(lambda x: f"{x:,}"),
+        text=formatear_miles(top_productos['cantidad_total']),
         color='cantidad_total',
         color_continuous_scale='Blues'
     )
-    
+
     fig.update_layout(
         xaxis_title="Cantidad Total",
         yaxis_title="Producto",
         yaxis={'categoryorder':'total ascending'},
         bargap=0.3
     )
-    
+
     fig.update_traces(
         textposition='auto',
         textfont_size=12,
         width=0.7  # Barras más anchas
     )
-    
+
     st.plotly_chart(fig, use_container_width=True)
-    
+
     st.markdown("""
     **Interpretación:** Este gráfico muestra los productos más vendidos por cantidad.
     Estos productos tienen alta rotación y son clave para mantener el volumen de ventas.
     """)
 
-with col2:
-    # Productos por valor total
-    top_productos_valor = df_filtrado.groupby(['art_codi', 'art_desc']).agg({
-        'valor_total': 'sum'
-    }).sort_values('valor_total', ascending=False).head(10).reset_index()
-    
-    # Agrupar productos pequeños si es necesario
-    if len(top_productos_valor) > 0:
-        total_valor = top_productos_valor['valor_total'].sum()
-        top_productos_valor['porcentaje'] = top_productos_valor['valor_total'] / total_valor * 100
-    
+def mostrar_top_productos_valor(top_productos_valor):
     fig = px.bar(
         top_productos_valor,
         y='art_desc',
         x='valor_total',
         title='Top 10 Productos por Valor Total',
         orientation='h',
-        text=top_productos_valor['valor_total'].apply(lambda x: f"${x:,.2f}"),
+        text=formatear_moneda(top_productos_valor['valor_total']),
         color='valor_total',
         color_continuous_scale='Reds'
     )
-    
+
     fig.update_layout(
         xaxis_title="Valor Total ($)",
         yaxis_title="Producto",
         yaxis={'categoryorder':'total ascending'},
         bargap=0.3
     )
-    
+
     fig.update_traces(
         textposition='auto',
         textfont_size=12,
         width=0.7  # Barras más anchas
     )
-    
+
     st.plotly_chart(fig, use_container_width=True)
-    
+
     st.markdown("""
     **Interpretación:** Este gráfico muestra los productos que generan mayor valor en ventas.
     Estos productos son estratégicos para la rentabilidad del negocio, aunque no necesariamente
     sean los más vendidos por cantidad.
     """)
 
-# Análisis por Categoría con Drill-down
-st.header('Análisis por Categoría')
-st.markdown("""
-Esta sección permite analizar la distribución de ventas por categoría y profundizar en el detalle
-de subcategorías y productos específicos de cada categoría seleccionada.
-""")
+def mostrar_drilldown(arbol):
+    # Selectores encadenados: cada elección baja un nivel en el árbol precalculado
+    niveles = arbol['niveles']
+    ruta = []
+    nodo = arbol
+    for nivel in niveles[:-1]:
+        seleccion = st.selectbox(
+            f"Seleccionar {NOMBRES_NIVEL[nivel]} para Ver Detalle",
+            ["Todas"] + list(nodo['hijos'].index),
+            key="drilldown/" + "/".join(map(str, ruta))
+        )
+        if seleccion == "Todas":
+            break
+        ruta.append(seleccion)
+        nodo = nodo['subarbol'][seleccion]
+
+    if ruta:
+        st.caption(
+            f"{NOMBRES_NIVEL[nodo['nivel']]} **{nodo['clave']}** · "
+            f"Valor: {formatear_valor(nodo['valor_total'])} · "
+            f"Cantidad: {nodo['cantidad_total']:,} · "
+            f"Clientes: {nodo['clientes']:,}"
+        )
 
-# Selector de categoría para drill-down
-categoria_seleccionada = st.selectbox(
-    "Seleccionar Categoría para Ver Detalle",
-    ["Todas"] + list(df_filtrado['categoria'].unique())
-)
+    nivel_hijos = niveles[len(ruta)]
+    columna_hijos = ETIQUETAS_NIVEL.get(nivel_hijos, nivel_hijos)
+    columna_hoja = ETIQUETAS_NIVEL.get(niveles[-1], niveles[-1])
 
-col1, col2 = st.columns(2)
+    col1, col2 = st.columns(2)
 
-with col1:
-    # Categorías
-    if categoria_seleccionada == "Todas":
-        categorias = df_filtrado.groupby('categoria').agg({
-            'valor_total': 'sum'
-        }).reset_index()
-        
-        # Agrupar categorías pequeñas
-        categorias = agrupar_pequenos(categorias, 'categoria', 'valor_total')
-        
-        fig = px.pie(
-            categorias,
-            values='valor_total',
-            names='categoria',
-            title='Distribución de Ventas por Categoría',
-            hole=0.4
-        )
-        
-        fig.update_traces(
-            textposition='inside',
-            textinfo='percent+label',
-            insidetextfont=dict(size=12)
+    with col1:
+        # Distribución de los hijos del nodo seleccionado
+        distribucion = agrupar_pequenos(
+            nodo['hijos'].reset_index()[[columna_hijos, 'valor_total']],
+            columna_hijos, 'valor_total'
         )
-        
-        st.plotly_chart(fig, use_container_width=True)
-        
-        st.markdown("""
-        **Interpretación:** Este gráfico muestra la distribución porcentual de las ventas por categoría.
-        Las categorías con mayor porcentaje representan las áreas de negocio más importantes.
-        """)
-    else:
-        # Mostrar subcategorías de la categoría seleccionada
-        subcategorias_filtradas = df_filtrado[df_filtrado['categoria'] == categoria_seleccionada]
-        subcategorias = subcategorias_filtradas.groupby('subcategoria').agg({
-            'valor_total': 'sum'
-        }).reset_index()
-        
-        # Agrupar subcategorías pequeñas
-        subcategorias = agrupar_pequenos(subcategorias, 'subcategoria', 'valor_total')
-        
+
+        if ruta:
+            titulo = f"Distribución de Ventas en {NOMBRES_NIVEL[nodo['nivel']]}: {nodo['clave']}"
+        else:
+            titulo = f'Distribución de Ventas por {NOMBRES_NIVEL[nivel_hijos]}'
+
         fig = px.pie(
-            subcategorias,
+            distribucion,
             values='valor_total',
-            names='subcategoria',
-            title=f'Distribución de Ventas en Categoría: {categoria_seleccionada}',
+            names=columna_hijos,
+            title=titulo,
             hole=0.4
         )
-        
+
         fig.update_traces(
             textposition='inside',
             textinfo='percent+label',
             insidetextfont=dict(size=12)
         )
-        
+
         st.plotly_chart(fig, use_container_width=True)
-        
-        st.markdown(f"""
-        **Interpretación:** Este gráfico muestra la distribución de ventas dentro de la categoría **{categoria_seleccionada}**.
-        Permite identificar las subcategorías más relevantes dentro de esta línea de productos.
-        """)
 
+        if ruta:
+            st.markdown(f"""
+            **Interpretación:** Este gráfico muestra la distribución de ventas dentro de **{nodo['clave']}**.
+            Permite identificar los elementos más relevantes dentro de esta línea de productos.
+            """)
+        else:
+            st.markdown("""
+            **Interpretación:** Este gráfico muestra la distribución porcentual de las ventas por categoría.
+            Las categorías con mayor porcentaje representan las áreas de negocio más importantes.
+            """)
+
+    with col2:
+        if not ruta and len(niveles) > 2:
+            # Mapa de árbol de los dos primeros niveles
+            fig = px.treemap(
+                arbol['agregados'][1].reset_index(),
+                path=list(niveles[:2]),
+                values='valor_total',
+                title=f'Distribución de Ventas por {NOMBRES_NIVEL[niveles[1]]}',
+                color='valor_total',
+                color_continuous_scale='Viridis'
+            )
+
+            st.plotly_chart(fig, use_container_width=True)
+
+            st.markdown("""
+            **Interpretación:** Este mapa de árbol muestra la distribución de ventas por subcategoría.
+            El tamaño de cada rectángulo representa el valor de ventas, permitiendo identificar
+            visualmente las subcategorías más importantes.
+            """)
+        else:
+            # Mejores productos bajo el nodo seleccionado
+            productos = nodo['top_hojas']
+            destino = f"{NOMBRES_NIVEL[nodo['nivel']]}: {nodo['clave']}" if ruta else "Total"
+
+            fig = px.bar(
+                productos,
+                y=columna_hoja,
+                x='valor_total',
+                title=f'Top 10 Productos en {destino}',
+                orientation='h',
+                text=formatear_moneda(productos['valor_total']),
+                color='valor_total',
+                color_continuous_scale='Viridis'
+            )
+
+            fig.update_layout(
+                yaxis={'categoryorder':'total ascending'},
+                xaxis_title="Valor Total ($)",
+                yaxis_title="Producto",
+                bargap=0.3
+            )
+
+            fig.update_traces(
+                textposition='auto',
+                textfont_size=12,
+                width=0.7  # Barras más anchas
+            )
+
+            st.plotly_chart(fig, use_container_width=True)
+
+            st.markdown(f"""
+            **Interpretación:** Este gráfico muestra los productos más vendidos dentro de **{destino}**.
+            Permite identificar qué productos específicos están impulsando las ventas en este nivel.
+            """)
+
+# Sidebar para filtros
+st.sidebar.title("Filtros")
+
+# Cargar datos: una sola copia de solo lectura por proceso, compartida por todas
+# las sesiones (st.cache_data entregaría una copia deserializada a cada una)
+def load_data():
+    return datos_compartidos()
+
+# API local opcional (DASHBOARD_API_PUERTO): corre en este mismo proceso y
+# comparte los agregados cacheados con el dashboard. Un solo servidor por
+# puerto; si los datos se recargan, se le pasan los nuevos.
+@st.cache_resource
+def api_local(_df, _df_clientes, _version, puerto):
+    return iniciar_en_segundo_plano(_df, _df_clientes, _version, puerto=puerto)
+
+try:
+    df, df_clientes, version = load_data()
+    data_load_state = st.sidebar.success('Datos cargados correctamente!')
+except Exception as e:
+    st.sidebar.error(f'Error al cargar los datos: {e}')
+    st.stop()
+
+# Resultado de la ingesta: filas rechazadas por la validación o descartadas
+# por duplicadas
+ingesta = INGESTAS.get(RUTA_VENTAS)
+if ingesta and ingesta['resumen']['filas_rechazadas']:
+    st.sidebar.warning(
+        f"{ingesta['resumen']['filas_rechazadas']:,} filas del archivo de ventas fueron rechazadas "
+        "por la validación (ver 'Ingesta de datos')."
+    )
+if ingesta and ingesta['resumen']['filas_duplicadas']:
+    st.sidebar.warning(
+        f"{ingesta['resumen']['filas_duplicadas']:,} filas del archivo de ventas eran idénticas a otra "
+        "y se descartaron como duplicadas (ver 'Ingesta de datos')."
+    )
+
+if os.environ.get('DASHBOARD_API_PUERTO'):
+    try:
+        servidor_api = api_local(df, df_clientes, version, int(os.environ['DASHBOARD_API_PUERTO']))
+        if servidor_api.datos['version'] != version:
+            servidor_api.actualizar_datos(df, df_clientes, version)
+    except OSError as e:
+        st.sidebar.warning(f"No se pudo iniciar la API local: {e}")
+
+# Filtros interactivos en sidebar
+años_disponibles = sorted(df['anio'].unique())
+categorias_disponibles = sorted(df['categoria'].unique())
+
+# Filtro de año
+años_seleccionados = st.sidebar.multiselect(
+    "Seleccionar Años",
+    años_disponibles,
+    default=años_disponibles[-1:]  # Por defecto, el último año
+)
+
+# Filtro de categoría
+categorias_seleccionadas = st.sidebar.multiselect(
+    "Seleccionar Categorías",
+    categorias_disponibles,
+    default=[]  # Por defecto, todas las categorías
+)
+
+# Aplicar filtros
+df_filtrado = filtrar_datos(df, años_seleccionados, categorias_seleccionadas)
+
+# Filtro para comparación de períodos
+st.sidebar.subheader("Comparación de Períodos")
+comparar_periodos = st.sidebar.checkbox("Activar comparación de períodos")
+
+if comparar_periodos:
+    col1, col2 = st.sidebar.columns(2)
+    with col1:
+        periodo1_año = st.selectbox("Año 1", años_disponibles, index=len(años_disponibles)-2 if len(años_disponibles) > 1 else 0)
+        periodo1_mes = st.selectbox("Mes 1", range(1, 13), index=0, format_func=lambda x: MESES[x])
+    with col2:
+        periodo2_año = st.selectbox("Año 2", años_disponibles, index=len(años_disponibles)-1)
+        periodo2_mes = st.selectbox("Mes 2", range(1, 13), index=0, format_func=lambda x: MESES[x])
+
+# Renderizado progresivo
+st.sidebar.subheader("Rendimiento")
+renderizado_progresivo = st.sidebar.checkbox(
+    "Renderizado progresivo",
+    value=True,
+    help="Muestra primero los KPIs y completa cada gráfico a medida que termina su cálculo."
+)
+
+# Secciones pesadas pendientes de calcular: (placeholder, cálculo, argumentos, visualización)
+secciones = []
+
+# Título
+st.title('Dashboard de Análisis de Ventas')
+st.markdown("""
+Este dashboard proporciona un análisis completo de las ventas, permitiendo visualizar tendencias,
+identificar patrones y segmentar clientes para tomar decisiones estratégicas basadas en datos.
+""")
+
+# KPIs
+st.header('KPIs Generales')
+st.markdown("""
+Los siguientes indicadores muestran el rendimiento general de las ventas en el período seleccionado.
+""")
+
+col1, col2, col3, col4, col5 = st.columns(5)
+
+kpis = calcular_kpis(df_filtrado)
+
+with col1:
+    st.metric("Valor Total", formatear_valor(kpis['valor_total']))
 with col2:
-    # Subcategorías o productos según selección
-    if categoria_seleccionada == "Todas":
-        # Subcategorías generales
-        subcategorias = df_filtrado.groupby('subcategoria').agg({
-            'valor_total': 'sum'
-        }).reset_index()
-        
-        # Agrupar subcategorías pequeñas
-        subcategorias = agrupar_pequenos(subcategorias, 'subcategoria', 'valor_total')
-        
-        fig = px.treemap(
-            subcategorias,
-            path=['subcategoria'],
-            values='valor_total',
-            title='Distribución de Ventas por Subcategoría',
-            color='valor_total',
-            color_continuous_scale='Viridis'
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
-        
-        st.markdown("""
-        **Interpretación:** Este mapa de árbol muestra la distribución de ventas por subcategoría.
-        El tamaño de cada rectángulo representa el valor de ventas, permitiendo identificar
-        visualmente las subcategorías más importantes.
-        """)
-    else:
-        # Mostrar productos de la categoría seleccionada
-        productos_categoria = df_filtrado[df_filtrado['categoria'] == categoria_seleccionada]
-        productos = productos_categoria.groupby('art_desc').agg({
-            'valor_total': 'sum'
-        }).sort_values('valor_total', ascending=False).head(10).reset_index()
-        
-        fig = px.bar(
-            productos,
-            y='art_desc',
-            x='valor_total',
-            title=f'Top 10 Productos en Categoría: {categoria_seleccionada}',
-            orientation='h',
-            text=productos['valor_total'].apply(lambda x: f"${x:,.2f}"),
-            color='valor_total',
-            color_continuous_scale='Viridis'
-        )
-        
-        fig.update_layout(
-            yaxis={'categoryorder':'total ascending'},
-            xaxis_title="Valor Total ($)",
-            yaxis_title="Producto",
-            bargap=0.3
-        )
-        
-        fig.update_traces(
-            textposition='auto',
-            textfont_size=12,
-            width=0.7  # Barras más anchas
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
-        
-        st.markdown(f"""
-        **Interpretación:** Este gráfico muestra los productos más vendidos dentro de la categoría **{categoria_seleccionada}**.
-        Permite identificar qué productos específicos están impulsando las ventas en esta categoría.
-        """)
+    st.metric("Cantidad Total", formatear_valor(kpis['cantidad_total']))
+with col3:
+    st.metric("Ticket Promedio", formatear_valor(kpis['ticket_promedio']))
+with col4:
+    st.metric("Clientes Únicos", f"{kpis['clientes_unicos']:,}")
+with col5:
+    st.metric("Productos Únicos", f"{kpis['productos_unicos']:,}")
+
+# Tasa de Crecimiento (Mes a Mes con Filtro de Año)
+st.header('Tasa de Crecimiento')
+st.markdown("""
+Este gráfico muestra la evolución de las ventas mes a mes y el porcentaje de crecimiento respecto al mes anterior
+(enero se compara con diciembre del año previo) o respecto al mismo mes del año anterior.
+Las barras verdes indican crecimiento positivo, mientras que las rojas señalan decrecimiento.
+""")
+
+col1, col2, col3 = st.columns(3)
+
+with col1:
+    # Selector de año para tasa de crecimiento
+    año_crecimiento = st.selectbox(
+        "Seleccionar Año para Análisis de Crecimiento",
+        años_disponibles,
+        index=len(años_disponibles)-1
+    )
+
+with col2:
+    categoria_crecimiento = st.selectbox(
+        "Categoría",
+        [TOTAL] + categorias_disponibles,
+        key="categoria_crecimiento"
+    )
+
+with col3:
+    metrica_crecimiento = st.radio(
+        "Comparar contra",
+        list(METRICAS_CRECIMIENTO),
+        format_func=lambda m: 'Mes anterior' if m == 'crecimiento' else 'Mismo mes del año anterior',
+        horizontal=True
+    )
+
+secciones.append((
+    seccion_pendiente(), calcular_crecimiento, (df, version, año_crecimiento, categoria_crecimiento),
+    partial(mostrar_crecimiento, año_crecimiento=año_crecimiento,
+            metrica=metrica_crecimiento, categoria=categoria_crecimiento)
+))
+
+# Análisis Temporal
+st.header('Análisis Temporal')
+st.markdown("""
+Estos gráficos muestran la evolución de las ventas a lo largo del tiempo y la distribución por mes y año.
+La tendencia permite identificar patrones estacionales y el mapa de calor facilita la comparación entre períodos.
+""")
+
+col1, col2 = st.columns(2)
+
+with col1:
+    # Tendencia de ventas
+    secciones.append((seccion_pendiente(), calcular_tendencia, (df_filtrado,), mostrar_tendencia))
+
+with col2:
+    # Mapa de calor por mes y año
+    secciones.append((seccion_pendiente(), calcular_mapa_calor, (df_filtrado,), mostrar_mapa_calor))
+
+# Índice de Estacionalidad
+st.header('Índice de Estacionalidad')
+st.markdown("""
+Este gráfico muestra qué meses tienen ventas por encima o por debajo del promedio anual.
+Un índice mayor a 1.0 indica que el mes tiene ventas superiores al promedio, mientras que
+valores menores a 1.0 indican ventas por debajo del promedio. Es útil para identificar
+patrones estacionales y planificar estrategias específicas para cada período.
+""")
+
+categoria_estacionalidad = st.selectbox(
+    "Categoría",
+    [TOTAL] + categorias_disponibles,
+    key="categoria_estacionalidad"
+)
+
+secciones.append((
+    seccion_pendiente(), calcular_estacionalidad, (df, version, categoria_estacionalidad),
+    mostrar_estacionalidad
+))
+
+# Comparación de períodos si está activada
+if comparar_periodos:
+    st.header('Comparación de Períodos')
+    st.markdown(f"""
+    Esta sección compara los KPIs y la distribución de ventas entre dos períodos seleccionados:
+    **{MESES[periodo1_mes]} {periodo1_año}** vs **{MESES[periodo2_mes]} {periodo2_año}**.
+    Los porcentajes muestran la variación entre ambos períodos.
+    """)
+
+    periodo1 = (periodo1_año, periodo1_mes)
+    periodo2 = (periodo2_año, periodo2_mes)
+    secciones.append((
+        seccion_pendiente(), calcular_comparacion, (df, periodo1, periodo2),
+        partial(mostrar_comparacion, periodo1=periodo1, periodo2=periodo2)
+    ))
+
+# Análisis por Cliente
+st.header('Análisis por Cliente')
+st.markdown("""
+Esta sección muestra los clientes más importantes según su valor total de compras y su frecuencia.
+Permite identificar a los clientes VIP y aquellos con patrones de compra específicos.
+""")
+
+st.write("Clientes únicos en datos filtrados:", kpis['clientes_unicos'])
+
+col1, col2 = st.columns(2)
+
+with col1:
+    # Top clientes con nombres
+    secciones.append((
+        seccion_pendiente(), calcular_top_clientes, (df_filtrado, df_clientes), mostrar_top_clientes
+    ))
+
+with col2:
+    # Histograma de frecuencia de compra
+    secciones.append((seccion_pendiente(), calcular_frecuencia, (df_filtrado,), mostrar_frecuencia))
+
+# Distribución de ticket y valor por cliente
+st.header('Distribución de Ticket y Valor por Cliente')
+st.markdown("""
+Estos gráficos muestran cómo se distribuyen el tamaño de cada ticket y el valor que compra cada cliente
+en un mes y categoría. La mediana y los percentiles altos complementan al ticket promedio.
+""")
+
+secciones.append((
+    seccion_pendiente(), calcular_distribuciones,
+    (df, version, años_seleccionados, categorias_seleccionadas),
+    mostrar_distribuciones
+))
+
+# Segmentación de Clientes (RFM simplificado)
+st.header('Segmentación de Clientes')
+st.markdown("""
+Este análisis segmenta a los clientes según su valor (eje vertical) y frecuencia (eje horizontal).
+Permite identificar diferentes perfiles de clientes y desarrollar estrategias específicas para cada segmento:
+
+- **VIP**: Alto valor y alta frecuencia - Clientes estratégicos que requieren atención prioritaria
+- **Grandes Ocasionales**: Alto valor pero baja frecuencia - Potencial para aumentar su frecuencia de compra
+- **Frecuentes Pequeños**: Bajo valor pero alta frecuencia - Candidatos para estrategias de up-selling
+- **Pequeños**: Bajo valor y baja frecuencia - Requieren activación o pueden no ser prioritarios
+""")
+
+secciones.append((
+    seccion_pendiente(), calcular_segmentacion, (df_filtrado, df_clientes), mostrar_segmentacion
+))
+
+# Tasa de Penetración en el Mercado
+st.header('Tasa de Penetración en el Mercado')
+st.markdown("""
+Este gráfico muestra el porcentaje de clientes que compran cada categoría de productos.
+Una alta penetración indica que la categoría es popular entre los clientes, mientras que una baja penetración
+puede representar una oportunidad de crecimiento o un nicho específico.
+""")
+
+secciones.append((seccion_pendiente(), calcular_penetracion, (df_filtrado,), mostrar_penetracion))
+
+# Análisis de Canasta
+st.header('Canasta')
+st.markdown("""
+Este análisis muestra qué categorías o subcategorías compran los mismos clientes en el mismo período.
+Permite detectar combinaciones frecuentes para promociones cruzadas, exhibición conjunta y recomendaciones.
+""")
+
+col1, col2 = st.columns(2)
+
+with col1:
+    nivel_canasta = st.selectbox(
+        "Nivel de la Canasta",
+        NIVELES_CANASTA,
+        format_func=NOMBRES_NIVEL.get
+    )
+
+with col2:
+    canasta_por_periodo = st.checkbox(
+        "Solo compras del mismo mes",
+        value=True,
+        help="Si se desactiva, se consideran todas las compras del cliente en el período filtrado."
+    )
+
+secciones.append((
+    seccion_pendiente(), canasta_filtrada,
+    (df, version, tuple(años_seleccionados), tuple(categorias_seleccionadas), nivel_canasta, canasta_por_periodo),
+    mostrar_canasta
+))
+
+# Análisis por Producto
+st.header('Análisis por Producto')
+st.markdown("""
+Esta sección muestra los productos más vendidos por cantidad y por valor total.
+Permite identificar los productos estrella y aquellos que generan mayor ingreso.
+""")
+
+col1, col2 = st.columns(2)
+
+with col1:
+    # Top productos por cantidad
+    secciones.append((
+        seccion_pendiente(), calcular_top_productos, (df_filtrado, 'cantidad_total'),
+        mostrar_top_productos_cantidad
+    ))
+
+with col2:
+    # Productos por valor total
+    secciones.append((
+        seccion_pendiente(), calcular_top_productos, (df_filtrado, 'valor_total'),
+        mostrar_top_productos_valor
+    ))
+
+# Análisis por Categoría con Drill-down
+st.header('Análisis por Categoría')
+st.markdown("""
+Esta sección permite analizar la distribución de ventas por categoría y profundizar en el detalle
+de subcategorías y productos específicos de cada categoría seleccionada.
+""")
+
+# Los selectores de cada nivel se crean al rellenar la sección, a partir del árbol
+secciones.append((
+    seccion_pendiente(), arbol_categorias,
+    (df, version, tuple(años_seleccionados), tuple(categorias_seleccionadas)),
+    mostrar_drilldown
+))
 
 # Resumen y conclusiones
 st.header('Resumen y Conclusiones')
@@ -891,4 +1077,49 @@ Este dashboard proporciona una visión completa del rendimiento de ventas, permi
 
 Las decisiones basadas en estos datos pueden ayudar a optimizar inventarios, mejorar estrategias de marketing,
 personalizar la atención al cliente y maximizar la rentabilidad del negocio.
-""")
\ No newline at end of file
+""")
+
+# Calcular y rellenar las secciones pesadas a medida que terminan
+renderizar_secciones(secciones, progresivo=renderizado_progresivo)
+
+# Memoria propia de esta sesión, solo informativa (no se aplica un límite): su
+# estado y los datos filtrados (sin filtros, df_filtrado es el mismo DataFrame
+# compartido y no suma). No incluye los intermedios de cada ejecución.
+def memoria_sesion_mb():
+    propia = sum(tamaño_bytes(valor) for valor in st.session_state.to_dict().values())
+    if df_filtrado is not df:
+        propia += tamaño_bytes(df_filtrado)
+    return propia / MB
+
+# Etapas de la ingesta: filas que entran y salen y velocidad de cada una
+if ingesta:
+    with st.sidebar.expander("Ingesta de datos"):
+        resumen = ingesta['resumen']
+        st.caption(
+            f"{resumen['filas_leidas']:,} filas leídas → {resumen['filas_hechos']:,} hechos mensuales, "
+            f"{resumen['filas_rechazadas']:,} rechazadas, {resumen['filas_duplicadas']:,} duplicadas "
+            f"({resumen['segundos']:.1f} s)"
+        )
+        st.dataframe(
+            ingesta['estadisticas'][['etapa', 'filas_entrada', 'filas_salida', 'filas_por_segundo']].round(0),
+            hide_index=True
+        )
+        if len(ingesta['rechazadas']):
+            st.download_button(
+                "Descargar filas rechazadas y duplicadas",
+                ingesta['rechazadas'].to_csv(index=False).encode('utf-8'),
+                file_name='filas_rechazadas.csv',
+                mime='text/csv'
+            )
+
+# Métricas de memoria y cachés (al final, ya con los cálculos de esta ejecución)
+with st.sidebar.expander("Memoria y cachés"):
+    col1, col2 = st.columns(2)
+    col1.metric("Proceso (RSS)", f"{memoria_proceso_mb():,.0f} MB")
+    col2.metric("Esta sesión", f"{memoria_sesion_mb():,.1f} MB")
+    metricas = metricas_caches()
+    st.caption(f"Cachés compartidas: {metricas['mb'].sum():,.1f} MB en {metricas['entradas'].sum()} entradas")
+    st.dataframe(
+        metricas[['cache', 'entradas', 'mb', 'desalojos', 'aciertos', 'fallos']].round({'mb': 1}),
+        hide_index=True
+    )
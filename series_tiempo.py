@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+from analisis import MESES
+
+# Motor de series de tiempo: una matriz densa (anio, mes) x categoria construida
+# una vez por versión del dataset. Crecimiento mes a mes, año contra año, medias
+# móviles y estacionalidad se calculan para todas las categorías con operaciones
+# sobre la matriz completa; cambiar de año o categoría es solo un corte.
+
+# Columna con el total de todas las categorías
+TOTAL = 'Todas'
+
+# Variación porcentual respecto a la fila `desfase` posiciones atrás
+def _variacion(matriz, desfase):
+    resultado = np.full(matriz.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        resultado[desfase:] = (matriz[desfase:] / matriz[:-desfase] - 1) * 100
+    resultado[~np.isfinite(resultado)] = np.nan
+    return resultado
+
+# Media móvil de `ventana` meses con sumas acumuladas
+def _media_movil(matriz, ventana):
+    acumulado = np.vstack([np.zeros((1, matriz.shape[1])), np.cumsum(matriz, axis=0)])
+    resultado = np.full(matriz.shape, np.nan)
+    resultado[ventana - 1:] = (acumulado[ventana:] - acumulado[:-ventana]) / ventana
+    return resultado
+
+def construir_motor(df, columna='valor_total'):
+    # Índice mensual continuo: mes absoluto = anio * 12 + (mes - 1)
+    periodo = df['anio'].to_numpy(dtype=np.int64) * 12 + df['mes'].to_numpy(dtype=np.int64) - 1
+    valores = df[columna].to_numpy(dtype=float)
+    codigos, categorias = pd.factorize(df['categoria'], sort=True)
+
+    inicio = int(periodo.min()) if len(periodo) else 0
+    n_meses = int(periodo.max()) - inicio + 1 if len(periodo) else 0
+    n_categorias = len(categorias)
+    fila = periodo - inicio
+
+    # Una sola pasada sobre los hechos: bincount sobre el índice plano (fila, categoría)
+    con_categoria = codigos >= 0
+    por_categoria = np.bincount(
+        fila[con_categoria] * n_categorias + codigos[con_categoria],
+        weights=valores[con_categoria],
+        minlength=n_meses * n_categorias
+    ).reshape(n_meses, n_categorias)
+    total = np.bincount(fila, weights=valores, minlength=n_meses)
+    ventas = np.column_stack([por_categoria, total])
+
+    absolutos = inicio + np.arange(n_meses)
+    anio, mes = absolutos // 12, absolutos % 12 + 1
+
+    # Estacionalidad: ventas de cada mes del año sobre el promedio mensual
+    por_mes = np.zeros((12, ventas.shape[1]))
+    np.add.at(por_mes, mes - 1, ventas)
+    meses_presentes = np.unique(mes)
+    por_mes = por_mes[meses_presentes - 1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        estacionalidad = por_mes / por_mes.mean(axis=0)
+
+    return {
+        'inicio': inicio,
+        'anio': anio,
+        'mes': mes,
+        'columnas': pd.Index(list(categorias) + [TOTAL]),
+        'ventas': ventas,
+        'mom': _variacion(ventas, 1),
+        'yoy': _variacion(ventas, 12),
+        'movil_3': _media_movil(ventas, 3),
+        'movil_12': _media_movil(ventas, 12),
+        'meses_estacionalidad': meses_presentes,
+        'estacionalidad': estacionalidad,
+    }
+
+# Filas de la matriz que corresponden a un año (corte contiguo)
+def _filas_año(motor, año):
+    n_meses = len(motor['mes'])
+    desde = min(max(int(año) * 12 - motor['inicio'], 0), n_meses)
+    hasta = min(max(int(año) * 12 + 12 - motor['inicio'], 0), n_meses)
+    return slice(desde, hasta)
+
+# Serie mensual de un año y una categoría: ventas, crecimiento y medias móviles
+def serie_anual(motor, año, categoria=TOTAL):
+    filas = _filas_año(motor, año)
+    j = motor['columnas'].get_loc(categoria)
+    serie = pd.DataFrame({
+        'mes': motor['mes'][filas],
+        'valor_total': motor['ventas'][filas, j],
+        'crecimiento': motor['mom'][filas, j],
+        'crecimiento_anual': motor['yoy'][filas, j],
+        'movil_3': motor['movil_3'][filas, j],
+        'movil_12': motor['movil_12'][filas, j],
+    })
+    serie['nombre_mes'] = serie['mes'].map(MESES)
+    return serie
+
+# Índice de estacionalidad por mes para una categoría
+def indice_estacionalidad(motor, categoria=TOTAL):
+    j = motor['columnas'].get_loc(categoria)
+    indice = pd.DataFrame({
+        'mes': motor['meses_estacionalidad'],
+        'indice': motor['estacionalidad'][:, j],
+    })
+    indice['nombre_mes'] = indice['mes'].map(MESES)
+    return indice
@@ -0,0 +1,59 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agregados import memoizar  # noqa: E402
+
+
+# Varios hilos que fallan a la vez en la misma clave calculan una sola vez
+def test_fallos_concurrentes_calculan_una_vez():
+    llamadas = []
+
+    @memoizar(max_entradas=4)
+    def lento_una_vez(x):
+        llamadas.append(x)
+        time.sleep(0.2)
+        return x * 2
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        resultados = list(executor.map(lambda _: lento_una_vez(21), range(8)))
+
+    assert resultados == [42] * 8
+    assert llamadas == [21]
+    estadisticas = lento_una_vez.estadisticas()
+    assert estadisticas['fallos'] == 1
+    assert estadisticas['esperas'] + estadisticas['aciertos'] == 7
+
+
+# Si el cálculo falla, los hilos en espera reciben la excepción y la clave
+# queda libre para el siguiente intento
+def test_excepcion_se_propaga_a_los_que_esperan():
+    empezado = threading.Event()
+    seguir = threading.Event()
+
+    @memoizar()
+    def falla_una_vez(x):
+        empezado.set()
+        seguir.wait(5)
+        raise ValueError(x)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        primero = executor.submit(falla_una_vez, 1)
+        empezado.wait(5)
+        segundo = executor.submit(falla_una_vez, 1)
+        time.sleep(0.1)
+        seguir.set()
+        for futuro in (primero, segundo):
+            with pytest.raises(ValueError):
+                futuro.result()
+
+    assert falla_una_vez.estadisticas()['fallos'] == 1
+    with pytest.raises(ValueError):
+        falla_una_vez(1)
+    assert falla_una_vez.estadisticas()['fallos'] == 2
@@ -0,0 +1,88 @@
+import gzip
+import json
+import os
+import sys
+import urllib.error
+import urllib.request
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, 'benchmarks'))
+
+from api import iniciar_en_segundo_plano  # noqa: E402
+from regresion import datos_sinteticos  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def servidor():
+    df, df_clientes = datos_sinteticos(filas=20_000, clientes=2_000)
+    servidor = iniciar_en_segundo_plano(df, df_clientes, puerto=0)
+    servidor.datos_originales = (df, df_clientes)
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+# Devuelve (estado, cabeceras, cuerpo) sin lanzar excepción en 304/400
+def pedir(servidor, ruta, cabeceras=None):
+    url = f'http://127.0.0.1:{servidor.server_port}{ruta}'
+    peticion = urllib.request.Request(url, headers=cabeceras or {})
+    try:
+        with urllib.request.urlopen(peticion, timeout=30) as r:
+            return r.status, r.headers, r.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def test_tabla_columnar(servidor):
+    estado, cabeceras, cuerpo = pedir(servidor, '/top_clientes?n=3')
+    assert estado == 200
+    tabla = json.loads(cuerpo)['clientes']
+    assert tabla['filas'] == 3
+    assert all(len(valores) == 3 for valores in tabla['columnas'].values())
+
+
+def test_etag_debil_compartido_con_gzip(servidor):
+    _, plano, _ = pedir(servidor, '/top_productos')
+    _, comprimido, cuerpo = pedir(servidor, '/top_productos', {'Accept-Encoding': 'gzip'})
+    assert plano['ETag'].startswith('W/"')
+    assert plano['ETag'] == comprimido['ETag']
+    if comprimido.get('Content-Encoding') == 'gzip':
+        cuerpo = gzip.decompress(cuerpo)
+    assert json.loads(cuerpo)['filas'] > 0
+
+
+def test_if_none_match_responde_304(servidor):
+    _, cabeceras, _ = pedir(servidor, '/kpis')
+    estado, _, cuerpo = pedir(servidor, '/kpis', {'If-None-Match': cabeceras['ETag']})
+    assert estado == 304
+    assert cuerpo == b''
+
+
+def test_etag_cambia_al_actualizar_datos(servidor):
+    _, antes, _ = pedir(servidor, '/kpis')
+    df, df_clientes = servidor.datos_originales
+    try:
+        servidor.actualizar_datos(df.iloc[:-1], df_clientes)
+        estado, despues, _ = pedir(servidor, '/kpis', {'If-None-Match': antes['ETag']})
+        assert estado == 200
+        assert despues['ETag'] != antes['ETag']
+    finally:
+        servidor.actualizar_datos(df, df_clientes)
+
+
+@pytest.mark.parametrize('ruta', [
+    '/top_productos?metrica=margen',
+    '/comparacion?periodo1=2023-13&periodo2=2024-01',
+    '/comparacion?periodo1=2023&periodo2=2024-01',
+    '/canasta?nivel=art_desc',
+    '/top_clientes?n=-1',
+    '/top_clientes?n=0',
+    '/drilldown?ruta=a&ruta=b&ruta=c',
+])
+def test_parametros_invalidos_responden_400(servidor, ruta):
+    estado, _, cuerpo = pedir(servidor, ruta)
+    assert estado == 400
+    assert 'error' in json.loads(cuerpo)
@@ -0,0 +1,64 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingesta import ingerir_ventas  # noqa: E402
+
+ENCABEZADO = 'anio,mes,cod_clte,categoria,subcategoria,art_codi,art_desc,valor_total,cantidad_total\n'
+
+
+def escribir(tmp_path, lineas):
+    ruta = tmp_path / 'ventas.csv'
+    ruta.write_text(ENCABEZADO + ''.join(linea + '\n' for linea in lineas))
+    return str(ruta)
+
+
+# Una fila repetida en dos bloques cuyo valor_total se infiere como int64 en
+# uno (100) y como float64 en el otro (por el 7.5 vecino) se cuenta una sola vez
+def test_duplicado_entre_bloques_con_tipos_distintos(tmp_path):
+    ruta = escribir(tmp_path, [
+        '2024,1,001,A,S,10,P,100,5',
+        '2024,2,002,A,S,11,P2,50,1',
+        '2024,1,001,A,S,10,P,100,5',
+        '2024,3,003,A,S,12,P3,7.5,2',
+    ])
+    resultado = ingerir_ventas(ruta, filas_por_bloque=2, hilos=2)
+    hechos = resultado['hechos'].set_index('cod_clte')
+
+    assert len(hechos) == 3
+    assert hechos.loc['001', 'valor_total'] == 100
+    assert hechos.loc['001', 'cantidad_total'] == 5
+    deduplicacion = resultado['estadisticas'].set_index('etapa').loc['deduplicacion']
+    assert deduplicacion['filas_entrada'] - deduplicacion['filas_salida'] == 1
+    assert resultado['resumen']['filas_duplicadas'] == 1
+    assert resultado['resumen']['filas_rechazadas'] == 0
+
+
+# Los duplicados descartados se informan con su línea, como los rechazos
+def test_duplicados_se_informan_con_su_linea(tmp_path):
+    ruta = escribir(tmp_path, [
+        '2024,1,001,A,S,10,P,100,5',
+        '2024,13,002,A,S,11,P2,50,1',
+        '2024,1,001,A,S,10,P,100,5',
+        '2024,1,001,A,S,10,P,100,5',
+    ])
+    rechazadas = ingerir_ventas(ruta, filas_por_bloque=2)['rechazadas']
+
+    assert rechazadas['linea'].tolist() == [3, 4, 5]
+    assert rechazadas['motivo'].tolist()[1:] == ['duplicado', 'duplicado']
+    assert rechazadas['motivo'].iloc[0] != 'duplicado'
+
+
+# Líneas que solo difieren en una columna ajena al esquema no son duplicados
+def test_columnas_extra_distinguen_filas(tmp_path):
+    ruta = tmp_path / 'ventas.csv'
+    ruta.write_text(
+        ENCABEZADO.rstrip('\n') + ',num_doc\n'
+        '2024,1,001,A,S,10,P,100,5,1\n'
+        '2024,1,001,A,S,10,P,100,5,2\n'
+    )
+    hechos = ingerir_ventas(str(ruta), filas_por_bloque=1)['hechos']
+
+    assert len(hechos) == 1
+    assert hechos['valor_total'].iloc[0] == 200